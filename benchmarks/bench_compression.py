@@ -0,0 +1,90 @@
+"""
+CPU time and bytes saved by websocket compression per threshold.
+
+Every message is sent to --sessions clients, the compression cache compresses it once. Messages
+are a /ro/values NOTIFY of one value and a full descriptionChange of all Options.
+
+    python benchmarks/bench_compression.py --sessions 20 --rounds 200
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from argparse import ArgumentParser
+
+from common import make_description
+
+from homeconnect_ws_sim.ws_compression import CompressionCache, CompressionOptions
+
+_WBITS = 15
+
+
+def _messages(rounds: int) -> list[str]:
+    options = make_description()["option"]
+    messages = []
+    for sid in range(rounds):
+        messages.append(
+            json.dumps(
+                {
+                    "sID": sid,
+                    "msgID": 1,
+                    "resource": "/ro/values",
+                    "version": 1,
+                    "action": "NOTIFY",
+                    "data": [{"uid": 2, "value": 1 + sid % 2}],
+                }
+            )
+        )
+        messages.append(
+            json.dumps(
+                {
+                    "sID": sid,
+                    "msgID": 2,
+                    "resource": "/ro/descriptionChange",
+                    "version": 1,
+                    "action": "NOTIFY",
+                    "data": [
+                        {"uid": option["uid"], "available": True, "access": "READWRITE"}
+                        for option in options
+                    ],
+                }
+            )
+        )
+    return messages
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = [message.encode() for message in _messages(args.rounds)]
+    total = len(messages) * args.sessions
+    print(
+        f"{'threshold':>10} {'compressed':>11} {'cache hits':>11} {'saved':>8} "
+        f"{'compress us':>12} {'us/message':>11}"
+    )
+    for threshold in (0, 256, 1024, 4096):
+        cache = CompressionCache(
+            CompressionOptions(enabled=True, threshold=threshold, cache_size=args.sessions)
+        )
+        start = time.process_time()
+        for payload in messages:
+            for _ in range(args.sessions):
+                if len(payload) >= threshold:
+                    cache.compress(payload, _WBITS)
+        elapsed = time.process_time() - start
+        stats = cache.stats()
+        sent = sum(len(payload) for payload in messages) * args.sessions
+        saved = stats["bytes_saved"] / sent
+        compress_us = 1e6 * stats["compress_time"] / max(stats["messages"] - stats["cache_hits"], 1)
+        print(
+            f"{threshold:>10} {stats['messages']:>11} {stats['cache_hits']:>11} {saved:>8.1%} "
+            f"{compress_us:>12.1f} {1e6 * elapsed / total:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
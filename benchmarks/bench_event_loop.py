@@ -0,0 +1,118 @@
+"""
+Handshake throughput and session fan-out per event loop implementation.
+
+Handshakes: clients connect, at most --concurrency at a time, answer /ei/initialValues and send
+/ei/deviceReady. Fan-out: value changes are sent to all connected sessions.
+
+    python benchmarks/bench_event_loop.py --sessions 200 --changes 200
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from argparse import ArgumentParser
+from base64 import urlsafe_b64encode
+from secrets import token_bytes
+
+import aiohttp
+from common import AesClient, make_description
+
+from homeconnect_ws_sim.embedded import run_appliances
+from homeconnect_ws_sim.event_loop import LoopOptions, new_event_loop
+
+
+async def _handshake(
+    session: aiohttp.ClientSession, url: str, psk64: str, iv64: str, limit: asyncio.Semaphore
+) -> tuple[aiohttp.ClientWebSocketResponse, AesClient]:
+    async with limit:
+        ws = await session.ws_connect(url)
+    client = AesClient(psk64, iv64)
+    initial = client.decode(await ws.receive_bytes())
+    sid = initial["sID"]
+    await ws.send_bytes(
+        client.encode(
+            {
+                "sID": sid,
+                "msgID": initial["msgID"],
+                "resource": "/ei/initialValues",
+                "version": 2,
+                "action": "RESPONSE",
+                "data": [{"deviceID": "bench"}],
+            }
+        )
+    )
+    await ws.send_bytes(
+        client.encode(
+            {
+                "sID": sid,
+                "msgID": 1,
+                "resource": "/ei/deviceReady",
+                "version": 2,
+                "action": "NOTIFY",
+            }
+        )
+    )
+    return ws, client
+
+
+async def _receive(ws: aiohttp.ClientWebSocketResponse, client: AesClient, count: int) -> None:
+    for _ in range(count):
+        client.decode(await ws.receive_bytes())
+
+
+async def _run(sessions: int, changes: int, concurrency: int) -> tuple[float, float]:
+    psk64 = urlsafe_b64encode(token_bytes(32)).decode().rstrip("=")
+    iv64 = urlsafe_b64encode(token_bytes(16)).decode().rstrip("=")
+    connector = aiohttp.TCPConnector(limit=0)
+    async with (
+        run_appliances({"description": make_description(), "psk64": psk64, "iv64": iv64}) as (app,),
+        aiohttp.ClientSession(connector=connector) as session,
+    ):
+        # Connecting more clients at once than the listen backlog holds measures SYN retries
+        limit = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        clients = await asyncio.gather(
+            *(_handshake(session, app.url, psk64, iv64, limit) for _ in range(sessions))
+        )
+        handshakes = sessions / (time.perf_counter() - start)
+
+        power = app.appliance.entities_uid[2]
+        start = time.perf_counter()
+        receivers = [asyncio.create_task(_receive(ws, client, changes)) for ws, client in clients]
+        for change in range(changes):
+            await power.set_state({"value_raw": 2 - change % 2})
+            await asyncio.sleep(0)
+        await asyncio.gather(*receivers)
+        fan_out = sessions * changes / (time.perf_counter() - start)
+        await asyncio.gather(*(ws.close() for ws, _ in clients))
+    return handshakes, fan_out
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'loop':<10} {'handshakes/s':>14} {'notifies/s':>14}")
+    for implementation in ("asyncio", "uvloop"):
+        try:
+            if implementation == "uvloop":
+                import uvloop  # noqa: F401, PLC0415
+        except ImportError:
+            print(f"{implementation:<10} not installed, skipped")
+            continue
+        loop = new_event_loop(LoopOptions(implementation=implementation))
+        try:
+            handshakes, fan_out = loop.run_until_complete(
+                _run(args.sessions, args.changes, args.concurrency)
+            )
+        finally:
+            loop.close()
+        print(f"{implementation:<10} {handshakes:>14.0f} {fan_out:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
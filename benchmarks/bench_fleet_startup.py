@@ -0,0 +1,78 @@
+"""
+Startup time of a fleet started from a profile directory.
+
+For every count a directory of Diagnostic Dumps is written, parsed with load_profile_directory()
+and started with a FleetSupervisor, until every Appliance is listening.
+
+    python benchmarks/bench_fleet_startup.py --counts 1 100 1000 --workers 4
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from base64 import urlsafe_b64encode
+from pathlib import Path
+from secrets import token_bytes
+
+from common import make_description
+
+from homeconnect_ws_sim.fleet import FleetSupervisor
+from homeconnect_ws_sim.log import LogOptions
+from homeconnect_ws_sim.server import load_profile_directory
+
+
+def _write_profiles(directory: Path, count: int) -> None:
+    description = make_description()
+    for index in range(count):
+        entry = {
+            "data": {
+                "entry_data": {
+                    "description": description,
+                    "psk": urlsafe_b64encode(token_bytes(32)).decode().rstrip("="),
+                    "aes_iv": urlsafe_b64encode(token_bytes(16)).decode().rstrip("="),
+                },
+                "appliance_state": {"entities": [], "service_versions": {"ro": 1}},
+            }
+        }
+        (directory / f"config_entry-{index}.json").write_text(json.dumps(entry))
+
+
+async def _startup(directory: Path, workers: int, base_port: int) -> tuple[int, float, float]:
+    start = time.perf_counter()
+    configs = await load_profile_directory(directory)
+    parse = time.perf_counter() - start
+    fleet = FleetSupervisor(
+        configs, workers, base_port, asyncio.get_running_loop(), log_options=LogOptions("WARNING")
+    )
+    fleet.start()
+    try:
+        started = await fleet.started
+    finally:
+        fleet.stop()
+    return len(configs), parse, started
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=30000)
+    args = parser.parse_args()
+
+    print(f"{'appliances':>10} {'parse s':>9} {'start s':>9} {'total s':>9}")
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as directory:
+            _write_profiles(Path(directory), count)
+            started, parse, start = asyncio.run(
+                _startup(Path(directory), args.workers, args.base_port)
+            )
+        print(f"{started:>10} {parse:>9.3f} {start:>9.3f} {parse + start:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Message rate of the AES and the TLS-PSK transport.
+
+A client keeps a window of GET requests in flight and counts the responses per second.
+
+    python benchmarks/bench_transport.py --messages 20000 --window 32
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from argparse import ArgumentParser
+from base64 import urlsafe_b64encode
+from secrets import token_bytes
+
+import aiohttp
+from common import AesClient, PlainClient, make_description, tls_psk_context
+
+from homeconnect_ws_sim.embedded import run_appliances
+
+
+async def _rate(
+    url: str, client: AesClient | PlainClient, messages: int, window: int, **kwargs: object
+) -> float:
+    async with aiohttp.ClientSession() as session, session.ws_connect(url, **kwargs) as ws:
+        initial = client.decode((await ws.receive()).data)
+        sid = initial["sID"]
+
+        async def send(msg_id: int) -> None:
+            frame = client.encode(
+                {
+                    "sID": sid,
+                    "msgID": msg_id,
+                    "resource": "/ci/services",
+                    "version": 1,
+                    "action": "GET",
+                }
+            )
+            if isinstance(frame, bytes):
+                await ws.send_bytes(frame)
+            else:
+                await ws.send_str(frame)
+
+        start = time.perf_counter()
+        for msg_id in range(min(window, messages)):
+            await send(msg_id)
+        for received in range(messages):
+            client.decode((await ws.receive()).data)
+            if received + window < messages:
+                await send(received + window)
+        return messages / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--window", type=int, default=32)
+    args = parser.parse_args()
+
+    psk64 = urlsafe_b64encode(token_bytes(32)).decode().rstrip("=")
+    iv64 = urlsafe_b64encode(token_bytes(16)).decode().rstrip("=")
+    description = make_description()
+    print(f"{'transport':<10} {'messages/s':>12} {'us/message':>12}")
+    async with run_appliances({"description": description, "psk64": psk64, "iv64": iv64}) as (aes,):
+        rate = await _rate(aes.url, AesClient(psk64, iv64), args.messages, args.window)
+        print(f"{'AES':<10} {rate:>12.0f} {1e6 / rate:>12.1f}")
+    context = tls_psk_context(psk64)
+    if context is None:
+        print("TLS-PSK    needs Python 3.13, skipped")
+        return
+    async with run_appliances({"description": description, "psk64": psk64}) as (tls,):
+        rate = await _rate(tls.url, PlainClient(), args.messages, args.window, ssl=context)
+        print(f"{'TLS-PSK':<10} {rate:>12.0f} {1e6 / rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Serialization time of Message.dump() and of the wire templates.
+
+A static response and /ro/values NOTIFYs of one and of all Options are serialized for every
+Session, as Message.dump() did per Session and as the templates do with sID and msgID spliced in.
+
+    python benchmarks/bench_wire.py --sessions 20
+"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser
+
+from common import make_description, timeit
+from homeconnect_websocket.message import Action, Message
+
+from homeconnect_ws_sim.wire import WireEncoder
+
+
+def _values_message(values: list[dict]) -> Message:
+    message = Message(resource="/ro/values", action=Action.NOTIFY, data=values)
+    message.version = 1
+    return message
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    description = make_description()
+    services = [{"service": service, "version": 1} for service in ("ci", "ei", "iz", "ni", "ro")]
+    all_values = [{"uid": option["uid"], "value": 50} for option in description["option"]]
+    encoder = WireEncoder({"ro": 1})
+    request = Message(sid=1, msg_id=1, resource="/ci/services", version=1)
+    sessions = range(args.sessions)
+
+    def dump_response() -> None:
+        for sid in sessions:
+            response = request.responde(data=services)
+            response.sid = sid
+            response.dump()
+
+    def template_response() -> None:
+        template = encoder.response(request, lambda: services)
+        for sid in sessions:
+            template.encode(sid, 1)
+
+    def dump_values(values: list[dict]) -> None:
+        for sid in sessions:
+            message = _values_message(values)
+            message.sid = sid
+            message.msg_id = 1
+            message.dump()
+
+    def template_values(values: list[dict]) -> None:
+        template = encoder.values(values)
+        for sid in sessions:
+            template.encode(sid, 1)
+
+    cases = [
+        ("response", dump_response, template_response),
+        ("values x1", lambda: dump_values(all_values[:1]), lambda: template_values(all_values[:1])),
+        (
+            f"values x{len(all_values)}",
+            lambda: dump_values(all_values),
+            lambda: template_values(all_values),
+        ),
+    ]
+    print(f"{'message':<12} {'dump us':>10} {'template us':>12} {'speedup':>8}")
+    for name, dump, template in cases:
+        dump_time = timeit(dump, args.number)
+        template_time = timeit(template, args.number)
+        print(
+            f"{name:<12} {1e6 * dump_time:>10.1f} {1e6 * template_time:>12.1f} "
+            f"{dump_time / template_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
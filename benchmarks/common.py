@@ -0,0 +1,148 @@
+"""Helpers shared by the benchmarks."""
+
+from __future__ import annotations
+
+import hmac
+import json
+import ssl
+import statistics
+import time
+from base64 import urlsafe_b64decode
+from secrets import token_bytes
+from typing import TYPE_CHECKING
+
+from Crypto.Cipher import AES
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def make_description(options: int = 50, programs: int = 10) -> dict:
+    """Device description in the shape of parse_device_description()."""
+    return {
+        "info": {"deviceType": "Dishwasher"},
+        "status": [
+            {
+                "uid": 1,
+                "name": "BSH.Common.Status.OperationState",
+                "protocolType": "Integer",
+                "access": "read",
+                "available": True,
+            }
+        ],
+        "setting": [
+            {
+                "uid": 2,
+                "name": "BSH.Common.Setting.PowerState",
+                "protocolType": "Integer",
+                "access": "readWrite",
+                "available": True,
+                "enumeration": {"1": "Off", "2": "On"},
+                "initValue": "1",
+            }
+        ],
+        "event": [],
+        "command": [],
+        "option": [
+            {
+                "uid": 100 + i,
+                "name": f"Dishcare.Dishwasher.Option.O{i}",
+                "protocolType": "Integer",
+                "access": "readWrite",
+                "available": True,
+                "min": "0",
+                "max": "100",
+            }
+            for i in range(options)
+        ],
+        "program": [
+            {
+                "uid": 1000 + p,
+                "name": f"Dishcare.Dishwasher.Program.P{p}",
+                "available": True,
+                "options": [
+                    {"refUID": 100 + i, "access": "readWrite", "available": True}
+                    for i in range(options)
+                    if (i + p) % 3
+                ],
+            }
+            for p in range(programs)
+        ],
+        "selectedProgram": {
+            "uid": 31,
+            "name": "BSH.Common.Root.SelectedProgram",
+            "access": "readWrite",
+            "protocolType": "Integer",
+        },
+    }
+
+
+class AesClient:
+    """Client side of the AES framing."""
+
+    def __init__(self, psk64: str, iv64: str) -> None:
+        psk = urlsafe_b64decode(psk64 + "===")
+        self.iv = urlsafe_b64decode(iv64 + "===")
+        enckey = hmac.digest(psk, b"ENC", digest="sha256")
+        self.mackey = hmac.digest(psk, b"MAC", digest="sha256")
+        self.encrypt = AES.new(enckey, AES.MODE_CBC, self.iv)
+        self.decrypt = AES.new(enckey, AES.MODE_CBC, self.iv)
+        self.last_tx = bytes(16)
+        self.last_rx = bytes(16)
+
+    def _hmac(self, direction: bytes, last: bytes, enc_msg: bytes) -> bytes:
+        return hmac.digest(self.mackey, self.iv + direction + last + enc_msg, "sha256")[:16]
+
+    def encode(self, message: dict) -> bytes:
+        clear = json.dumps(message).encode()
+        pad_len = 16 - (len(clear) % 16)
+        if pad_len == 1:
+            pad_len += 16
+        clear = clear + b"\x00" + token_bytes(pad_len - 2) + bytes([pad_len])
+        enc_msg = self.encrypt.encrypt(clear)
+        self.last_tx = self._hmac(b"E", self.last_tx, enc_msg)
+        return enc_msg + self.last_tx
+
+    def decode(self, frame: bytes) -> dict:
+        enc_msg, recv_hmac = frame[:-16], frame[-16:]
+        if not hmac.compare_digest(recv_hmac, self._hmac(b"C", self.last_rx, enc_msg)):
+            msg = "HMAC Failure"
+            raise ValueError(msg)
+        self.last_rx = recv_hmac
+        clear = self.decrypt.decrypt(enc_msg)
+        return json.loads(clear[: -clear[-1]])
+
+
+class PlainClient:
+    """Client side of a TLS Connection, frames are JSON text."""
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message)
+
+    def decode(self, frame: str) -> dict:
+        return json.loads(frame)
+
+
+def tls_psk_context(psk64: str) -> ssl.SSLContext | None:
+    """TLS-PSK client context, None if this Python has no TLS-PSK support (before 3.13)."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if not hasattr(context, "set_psk_client_callback"):
+        return None
+    psk = urlsafe_b64decode(psk64 + "===")
+    context.maximum_version = ssl.TLSVersion.TLSv1_2
+    context.set_ciphers("PSK")
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.set_psk_client_callback(lambda _: (None, psk))
+    return context
+
+
+def timeit(func: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Median seconds per call of func."""
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        results.append((time.perf_counter() - start) / number)
+    return statistics.median(results)
@@ -0,0 +1,4 @@
+import time
+
+IMPORT_START = time.perf_counter()
+"perf_counter() when the package was imported, origin of the startup profile"
@@ -1,27 +1,97 @@
 from __future__ import annotations
 
-import asyncio
-import logging
+import time
 from argparse import ArgumentParser
+from dataclasses import replace
 from pathlib import Path
 
+from . import IMPORT_START
+from .event_loop import LOOP_IMPLEMENTATIONS, LoopOptions, new_event_loop
+from .heartbeat import HEARTBEAT_PROFILES
+from .log import LogOptions, setup_logging
 from .server import Server
+from .startup import startup_profile
+from .ws_compression import CompressionOptions
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s %(message)s",
-)
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def compression_options(threshold: int | None, level: int) -> CompressionOptions | None:
+    """Compression of an endpoint, enabled if a threshold is given."""
+    if threshold is None:
+        return None
+    return CompressionOptions(enabled=True, threshold=threshold, level=level)
 
 
 def main() -> None:
+    main_start = time.perf_counter()
     parser = ArgumentParser()
     parser.add_argument("-f", type=Path, default=None, dest="config_file")
     parser.add_argument("-p", type=int, default=8080, dest="port")
     parser.add_argument("-psk", type=str, default=None, dest="psk64")
+    parser.add_argument("-iv", type=str, default=None, dest="iv64")
+    parser.add_argument("-w", "--workers", type=int, default=0, dest="workers")
+    parser.add_argument("--base-port", type=int, default=10443, dest="base_port")
+    parser.add_argument("--profile-dir", type=Path, default=None, dest="profile_dir")
+    parser.add_argument("--copies", type=int, default=1, dest="copies")
+    parser.add_argument(
+        "--loop", choices=LOOP_IMPLEMENTATIONS, default="asyncio", dest="loop_implementation"
+    )
+    parser.add_argument("--executor-workers", type=int, default=None, dest="executor_workers")
+    parser.add_argument("--slow-callback", type=float, default=None, dest="slow_callback")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="DEBUG", dest="log_level")
+    parser.add_argument("--wire-log-level", choices=LOG_LEVELS, default=None, dest="wire_level")
+    parser.add_argument("--wire-log-rate", type=float, default=None, dest="wire_rate")
+    parser.add_argument("--gui-compress", type=int, default=None, dest="gui_compress")
+    parser.add_argument("--appliance-compress", type=int, default=None, dest="appliance_compress")
+    parser.add_argument("--compress-level", type=int, default=6, dest="compress_level")
+    parser.add_argument(
+        "--heartbeat", choices=HEARTBEAT_PROFILES, default="aiohttp", dest="heartbeat"
+    )
+    parser.add_argument("--heartbeat-interval", type=float, default=None, dest="heartbeat_interval")
+    parser.add_argument("--idle-timeout", type=float, default=None, dest="idle_timeout")
+    parser.add_argument("--profile-startup", action="store_true", dest="profile_startup")
     args = parser.parse_args()
-    loop = asyncio.new_event_loop()
-    server = Server(args.config_file, loop, psk64=args.psk64)
+    if args.profile_startup:
+        startup_profile.enable(IMPORT_START)
+        startup_profile.mark("imports", IMPORT_START, main_start)
+    log_options = LogOptions(
+        level=args.log_level,
+        wire_level=args.wire_level,
+        wire_rate=args.wire_rate,
+    )
+    with startup_profile.phase("setup logging"):
+        setup_logging(log_options)
+    loop_options = LoopOptions(
+        implementation=args.loop_implementation,
+        executor_workers=args.executor_workers,
+        slow_callback=args.slow_callback,
+    )
+    with startup_profile.phase("create event loop"):
+        loop = new_event_loop(loop_options)
+    heartbeat = HEARTBEAT_PROFILES[args.heartbeat]
+    if args.heartbeat_interval is not None:
+        heartbeat = replace(heartbeat, interval=args.heartbeat_interval or None)
+    if args.idle_timeout is not None:
+        heartbeat = replace(heartbeat, idle_timeout=args.idle_timeout)
+    with startup_profile.phase("create server"):
+        server = Server(
+            args.config_file,
+            loop,
+            psk64=args.psk64,
+            iv64=args.iv64,
+            workers=args.workers,
+            base_port=args.base_port,
+            loop_options=loop_options,
+            log_options=log_options,
+            profile_dir=args.profile_dir,
+            copies=args.copies,
+            gui_compression=compression_options(args.gui_compress, args.compress_level),
+            appliance_compression=compression_options(args.appliance_compress, args.compress_level),
+            heartbeat=heartbeat,
+        )
     loop.run_until_complete(server.run(args.port))
+    startup_profile.log_report()
     loop.run_forever()
 
 
@@ -2,13 +2,19 @@ from __future__ import annotations
 
 import logging
 import ssl
+import time
 from base64 import urlsafe_b64decode
-from typing import TYPE_CHECKING
+from functools import partial
+from typing import TYPE_CHECKING, Any
 
 from aiohttp import web
+from homeconnect_websocket.message import Action, Message
 
 from .const import DEFAULT_INFO, DEFAULT_SERVICE_VERSIONS
 from .entities import (
+    CODE_INVALID_VALUE,
+    CODE_NOT_WRITABLE,
+    CODE_UNKNOWN_ENTITY,
     ActiveProgram,
     Command,
     Entity,
@@ -18,48 +24,123 @@ from .entities import (
     SelectedProgram,
     Setting,
     Status,
+    WriteRejectedError,
 )
+from .events import ChangeType, EventBus
+from .hc_socket import AesKeys, derive_aes_keys
+from .heartbeat import HEARTBEAT_PROFILES, HeartbeatOptions, SessionLiveness, watch
+from .programs import ProgramEngine
 from .session import SimSession
+from .timing import SessionTiming, TimingStats
+from .wire import WireEncoder
+from .ws_compression import CompressionCache, prepare_websocket
 
 if TYPE_CHECKING:
     import asyncio
+    from collections.abc import Iterable
 
     from homeconnect_websocket import DeviceDescription
     from homeconnect_websocket.entities import DeviceInfo
-    from homeconnect_websocket.message import Message
+
+    from .events import EntityChangeEvent
+    from .network import NetworkConditions
+    from .ws_compression import CompressionOptions
+
+
+class _EntityAttribute:
+    """SimAppliance attribute created with the entities on first use."""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self._name = name
+
+    def __get__(self, instance: SimAppliance | None, owner: type | None = None) -> Any:
+        if instance is None:
+            return self
+        # Only reached until the entities exist, then the instance attribute takes precedence
+        instance._build_entities()  # noqa: SLF001
+        return instance.__dict__[self._name]
+
+
+def _client_uid(item: Any, key: str = "uid") -> int:
+    """Get a uid from an item written by a client, raises WriteRejectedError if malformed."""
+    uid = item.get(key) if isinstance(item, dict) else None
+    if isinstance(uid, bool) or not isinstance(uid, int):
+        raise WriteRejectedError(None, CODE_INVALID_VALUE, "Malformed write")
+    return uid
+
+
+def _client_list(data: Any) -> list:
+    """Check that data written by a client is a list, raises WriteRejectedError if not."""
+    if not isinstance(data, list):
+        raise WriteRejectedError(None, CODE_INVALID_VALUE, "Malformed write")
+    return data
 
 
 class SimAppliance:
-    """Base HomeConnect Appliance."""
+    """
+    Base HomeConnect Appliance.
+
+    Entities are created on first use, usually the first connection, so starting
+    many Appliances does not pay for entities that are never used.
+    """
 
     info: DeviceInfo
-    entities_uid: dict[int, Entity]
+    entities_uid: dict[int, Entity] = _EntityAttribute()
     "entities by uid"
 
-    entities: dict[str, Entity]
+    entities: dict[str, Entity] = _EntityAttribute()
     "entities by name"
 
-    status: dict[str, Status]
+    status: dict[str, Status] = _EntityAttribute()
     "status entities by name"
 
-    settings: dict[str, Setting]
+    settings: dict[str, Setting] = _EntityAttribute()
     "setting entities by name"
 
-    events: dict[str, Event]
+    events: dict[str, Event] = _EntityAttribute()
     "event entities by name"
 
-    commands: dict[str, Command]
+    commands: dict[str, Command] = _EntityAttribute()
     "command entities by name"
 
-    options: dict[str, Option]
+    options: dict[str, Option] = _EntityAttribute()
     "option entities by name"
 
-    programs: dict[str, Program]
+    programs: dict[str, Program] = _EntityAttribute()
     "program entities by name"
     sessions: set[SimSession]
+    bus: EventBus
+    "entity change events"
+
+    snapshots: dict[str, dict[int, dict]]
+    "entity states by snapshot name and uid"
+
     service_versions: dict[str, int]
-    _tls_site: web.TCPSite
-    _runner: web.AppRunner
+    wire: WireEncoder
+    "pre-serialized Messages"
+
+    aes_keys: AesKeys | None = None
+    "AES key material, None for TLS Appliances"
+
+    network_conditions: NetworkConditions | None = None
+    "Emulated network conditions of new Sessions"
+
+    heartbeat: HeartbeatOptions = HEARTBEAT_PROFILES["aiohttp"]
+    "Ping and idle-timeout settings of new Sessions"
+
+    compression: CompressionCache | None = None
+    "permessage-deflate settings and statistics of new Sessions, None to disable"
+
+    program_engine: ProgramEngine = _EntityAttribute()
+    "Option states per Program"
+
+    timing: TimingStats
+    "Client response times of all Sessions, including closed ones"
+
+    _active_program: ActiveProgram | None = _EntityAttribute()
+    _selected_program: SelectedProgram | None = _EntityAttribute()
+    _site: web.TCPSite
+    _runner: web.AppRunner | None = None
 
     def __init__(
         self,
@@ -67,6 +148,7 @@ class SimAppliance:
         psk64: str,
         services: dict[str, int] | None = None,
         logger: logging.Logger | None = None,
+        iv64: str | None = None,
     ) -> None:
         """
         HomeConnect Appliance.
@@ -74,12 +156,18 @@ class SimAppliance:
         Args:
         ----
             description (DeviceDescription): parsed Device description
-            host (str): Host
+            psk64 (str): urlsafe base64 encoded PSK
+            services (Optional[dict[str, int]]): Service versions
             logger (Optional[Logger]): Logger
+            iv64 (Optional[str]): urlsafe base64 encoded AES IV, enables AES encryption
 
         """
         self.psk64 = psk64
+        self.iv64 = iv64
+        if iv64:
+            self.aes_keys = derive_aes_keys(psk64, iv64)
         self.service_versions = services or DEFAULT_SERVICE_VERSIONS
+        self.wire = WireEncoder(self.service_versions)
         if logger is None:
             self._logger = logging.getLogger(__name__)
         else:
@@ -89,97 +177,184 @@ class SimAppliance:
         if "info":
             self.info.update(description["info"])
 
-        self.entities_uid = {}
-        self.entities = {}
-        self.status = {}
-        self.settings = {}
-        self.events = {}
-        self.commands = {}
-        self.options = {}
-        self.programs = {}
         self.sessions = set()
-        self._create_entities(description)
-
-    def _create_entities(self, description: DeviceDescription) -> None:
-        """Create Entities from Device description."""
-        for status in description["status"]:
-            entity = Status(status, self)
-            self.status[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        for setting in description["setting"]:
-            entity = Setting(setting, self)
-            self.settings[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        for event in description["event"]:
-            entity = Event(event, self)
-            self.events[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        for command in description["command"]:
-            entity = Command(command, self)
-            self.commands[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        for option in description["option"]:
-            entity = Option(option, self)
-            self.options[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        for program in description["program"]:
-            entity = Program(program, self)
-            self.programs[entity.name] = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        if "activeProgram" in description:
-            entity = ActiveProgram(description["activeProgram"], self)
-            self._active_program = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
-
-        if "selectedProgram" in description:
-            entity = SelectedProgram(description["selectedProgram"], self)
-            self._selected_program = entity
-            self.entities[entity.name] = entity
-            self.entities_uid[entity.uid] = entity
+        self.timing = TimingStats()
+        self.bus = EventBus()
+        self.bus.subscribe(self._track_snapshot_changes)
+        self.snapshots = {}
+        self._snapshot_changes: dict[str, set[int]] = {}
+        self._description = description
+        self._initial_state: list[dict] = []
+
+    def _build_entities(self) -> None:
+        """
+        Create the entities and apply the initial state.
+
+        Everything is built before it is assigned, if the description is invalid no
+        attribute is set and the next access raises again.
+        """
+        start = time.perf_counter()
+        attributes = self._create_entities(self._description)
+        attributes["program_engine"] = ProgramEngine(self._description)
+        entities_uid = attributes["entities_uid"]
+        self._restore_initial_state(entities_uid, self._initial_state)
+        for name, value in attributes.items():
+            setattr(self, name, value)
+        self._initial_state = []
+        self.bus.subscribe(
+            self.program_engine.entity_changed,
+            types=(ChangeType.ACCESS, ChangeType.AVAILABLE, ChangeType.MIN_MAX),
+            uids=self.program_engine.managed,
+        )
+        self._logger.debug(
+            "Created %s entities in %.3fs", len(entities_uid), time.perf_counter() - start
+        )
+
+    def _restore_initial_state(self, entities_uid: dict[int, Entity], state: list[dict]) -> None:
+        """Restore entity states in dump() format without sending, invalid ones are skipped."""
+        for entity_state in state:
+            entity = entities_uid.get(entity_state.get("uid"))
+            if entity is None:
+                self._logger.warning("Initial state of unknown entity %s", entity_state)
+                continue
+            try:
+                entity.restore(entity.parse_state(entity_state))
+            except (TypeError, ValueError):
+                self._logger.warning("Invalid initial state %s", entity_state)
+
+    def _create_entities(self, description: DeviceDescription) -> dict[str, Any]:
+        """Create Entities from Device description, returns the attributes to set."""
+        attributes: dict[str, Any] = {}
+        entities: dict[str, Entity] = {}
+        entities_uid: dict[int, Entity] = {}
+        for attribute, key, entity_class in (
+            ("status", "status", Status),
+            ("settings", "setting", Setting),
+            ("events", "event", Event),
+            ("commands", "command", Command),
+            ("options", "option", Option),
+            ("programs", "program", Program),
+        ):
+            by_name = attributes[attribute] = {}
+            for entity_description in description[key]:
+                entity = entity_class(entity_description, self)
+                by_name[entity.name] = entity
+                entities[entity.name] = entity
+                entities_uid[entity.uid] = entity
+
+        for attribute, key, entity_class in (
+            ("_active_program", "activeProgram", ActiveProgram),
+            ("_selected_program", "selectedProgram", SelectedProgram),
+        ):
+            attributes[attribute] = None
+            if key in description:
+                entity = entity_class(description[key], self)
+                attributes[attribute] = entity
+                entities[entity.name] = entity
+                entities_uid[entity.uid] = entity
+
+        attributes["entities"] = entities
+        attributes["entities_uid"] = entities_uid
+        return attributes
 
     async def _websocket_handler(self, request: web.Request) -> web.WebSocketResponse:
         self._logger.info("WebSocket connection from %s", request.remote)
-        websocket = web.WebSocketResponse(heartbeat=2)
-        await websocket.prepare(request)
-        sessions = SimSession(websocket, self)
+        # Create the entities before the handshake instead of in the middle of it
+        _ = self.entities_uid
+        websocket, sender = await prepare_websocket(request, self.compression, autoping=False)
+        timing = SessionTiming(self.timing)
+        liveness = SessionLiveness(
+            websocket, request.transport, on_rtt=partial(timing.observe, "ping")
+        )
+        unwatch = watch(liveness, self.heartbeat)
+        sessions = SimSession(websocket, self, sender=sender, liveness=liveness, timing=timing)
         self.sessions.add(sessions)
-        await sessions.run()
-        self.sessions.remove(sessions)
+        try:
+            await sessions.run()
+        finally:
+            unwatch()
+            self.sessions.remove(sessions)
         return websocket
 
-    async def start(self, loop: asyncio.AbstractEventLoop) -> None:
-        app = web.Application(loop=loop)
+    async def start(
+        self,
+        loop: asyncio.AbstractEventLoop | None = None,
+        port: int | None = None,
+        host: str | None = None,
+    ) -> None:
+        """
+        Start listening for connections.
+
+        Args:
+        ----
+            loop (Optional[AbstractEventLoop]): Event loop, defaults to the running loop
+            port (Optional[int]): Port, defaults to 443 for TLS and 80 for AES Appliances,
+                0 for an ephemeral port
+            host (Optional[str]): Host to bind to, defaults to all interfaces
+
+        """
+        app = web.Application(loop=loop) if loop else web.Application()
         app.router.add_get("/homeconnect", self._websocket_handler)
+        app.on_shutdown.append(self._on_shutdown)
         self._runner = web.AppRunner(app)
         await self._runner.setup()
 
+        if self.aes_keys:
+            self._site = web.TCPSite(self._runner, host=host, port=80 if port is None else port)
+            await self._site.start()
+            return
+
         psk = urlsafe_b64decode(self.psk64 + "===")
-        psk.hex()
         ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
         ssl_context.maximum_version = ssl.TLSVersion.TLSv1_2
         ssl_context.set_ciphers("ALL")
         ssl_context.check_hostname = False
         ssl_context.set_psk_server_callback(lambda _: psk)
-        self._tls_site = web.TCPSite(self._runner, port=443, ssl_context=ssl_context)
+        self._site = web.TCPSite(
+            self._runner, host=host, port=443 if port is None else port, ssl_context=ssl_context
+        )
+
+        await self._site.start()
+
+    def set_network_conditions(self, conditions: NetworkConditions | None) -> None:
+        """Emulate network conditions for all current and future Sessions, None to disable."""
+        self.network_conditions = conditions
+        for session in self.sessions:
+            session.set_network_conditions(conditions)
 
-        await self._tls_site.start()
+    def session_metrics(self) -> list[dict]:
+        """Liveness metrics of all Sessions."""
+        return [session.metrics() for session in self.sessions]
+
+    def session_timing(self) -> list[dict]:
+        """Client response times of all Sessions."""
+        return [session.timing_metrics() for session in self.sessions]
+
+    def set_compression(self, options: CompressionOptions | None) -> None:
+        """
+        Offer permessage-deflate to new Sessions, None to disable.
+
+        Never offered by AES Appliances, aiohttp would deflate every ciphertext frame.
+        """
+        if options is None or self.aes_keys is not None:
+            self.compression = None
+        else:
+            self.compression = CompressionCache(options)
+
+    async def _on_shutdown(self, _: web.Application) -> None:
+        for session in list(self.sessions):
+            await session.close()
 
     async def stop(self) -> None:
         await self._runner.cleanup()
 
+    @property
+    def port(self) -> int | None:
+        """Port the Appliance is listening on."""
+        if self._runner is None or not self._runner.addresses:
+            return None
+        return self._runner.addresses[0][1]
+
     def get_all_description_changes(self) -> list[dict]:
         values = []
         for entity in self.entities.values():
@@ -202,19 +377,193 @@ class SimAppliance:
             "service_versions": self.service_versions,
         }
 
-    async def set_state(self, state: list[dict]) -> None:
-        for entity in state:
-            await self.entities_uid[entity["uid"]].set_state(entity)
+    def set_initial_state(self, state: list[dict]) -> None:
+        """
+        Set entity states in dump() format without notifying the clients.
+
+        Meant for the state of a config before the Appliance is started, the entities are
+        not created for it. Invalid states are logged and skipped.
+        """
+        if "entities_uid" in self.__dict__:
+            self._restore_initial_state(self.entities_uid, state)
+        else:
+            self._initial_state.extend(state)
 
-    async def update_entities(self, data: list[dict]) -> None:
-        """Update entities from Message data."""
-        for entity in data:
-            uid = int(entity["uid"])
-            if uid in self.entities_uid:
-                await self.entities_uid[uid].update(entity)
-            else:
-                self._logger.debug("Recived Update for unkown entity %s", uid)
+    async def set_state(self, state: list[dict]) -> list[Entity]:
+        """
+        Set entity states in dump() format as one batch.
+
+        All states are validated before any is applied, raises KeyError for unknown
+        uids and ValueError for invalid values. Returns the changed entities.
+        """
+        states = [
+            (entity["uid"], self.entities_uid[entity["uid"]].parse_state(entity))
+            for entity in state
+        ]
+        return await self.apply_states(states)
+
+    def _track_snapshot_changes(self, event: EntityChangeEvent) -> None:
+        for changed in self._snapshot_changes.values():
+            changed.add(event.entity.uid)
+
+    def take_snapshot(self, name: str) -> None:
+        """Save the state of all entities as a named snapshot."""
+        self.snapshots[name] = {uid: entity.snapshot() for uid, entity in self.entities_uid.items()}
+        self._snapshot_changes[name] = set()
+
+    def delete_snapshot(self, name: str) -> None:
+        del self.snapshots[name]
+        del self._snapshot_changes[name]
+
+    async def restore_snapshot(self, name: str) -> list[Entity]:
+        """
+        Restore a named snapshot.
+
+        Only entities changed since the snapshot was taken or last restored are touched.
+        Returns the changed entities.
+        """
+        snapshot = self.snapshots[name]
+        changed = self._snapshot_changes[name]
+        tracked = self._snapshot_changes[name] = set()
+        entities, values, description_changes = self._restore_states(
+            (uid, snapshot[uid]) for uid in changed
+        )
+        # Only the change events of the restore itself are tracked so far, they match the
+        # snapshot again. Changes made while the notifications are sent stay tracked.
+        tracked.clear()
+        await self._send_changes(values, description_changes)
+        return entities
+
+    async def apply_states(self, states: Iterable[tuple[int, dict]]) -> list[Entity]:
+        """
+        Apply entity states in snapshot format.
+
+        Changes are send in one values and one descriptionChange notification.
+        Returns the changed entities.
+        """
+        entities, values, description_changes = self._restore_states(states)
+        await self._send_changes(values, description_changes)
+        return entities
+
+    def _restore_states(
+        self, states: Iterable[tuple[int, dict]]
+    ) -> tuple[list[Entity], list[dict], list[dict]]:
+        """Restore entity states without sending, returns the changed entities and changes."""
+        values = []
+        description_changes = []
+        entities = []
+        for uid, state in states:
+            entity = self.entities_uid[uid]
+            changes = entity.restore(state)
+            if not changes:
+                continue
+            entities.append(entity)
+            if "value" in changes:
+                values.append({"uid": uid, "value": changes.pop("value")})
+            if changes:
+                changes["uid"] = uid
+                description_changes.append(changes)
+        return entities, values, description_changes
+
+    async def _send_changes(self, values: list[dict], description_changes: list[dict]) -> None:
+        """Send changes in one values and one descriptionChange notification."""
+        if values:
+            await self.send_values(values)
+        if description_changes:
+            await self.send(
+                Message(
+                    resource="/ro/descriptionChange",
+                    action=Action.NOTIFY,
+                    data=description_changes,
+                )
+            )
+
+    async def select_program(self, program_uid: int, options: list[dict] | None = None) -> None:
+        """
+        Select a Program.
+
+        The Program and the Options, against their state in the Program, are validated before
+        anything is applied, raises WriteRejectedError for an unknown or unavailable Program
+        and for the first rejected Option. Only the Options
+        that differ between the Programs or were changed by other means are touched, the
+        changes, the selection and the Option values are send in one values and one
+        descriptionChange notification.
+        """
+        program = self.entities_uid.get(program_uid)
+        if not isinstance(program, Program) or program_uid not in self.program_engine:
+            raise WriteRejectedError(program_uid, CODE_UNKNOWN_ENTITY, "Unknown Program")
+        if program.available is False:
+            raise WriteRejectedError(program_uid, CODE_NOT_WRITABLE, "Program not available")
+        option_values = {}
+        for item in options or []:
+            uid = _client_uid(item)
+            entity = self.entities_uid.get(uid)
+            if entity is None:
+                raise WriteRejectedError(uid, CODE_UNKNOWN_ENTITY, "Unknown entity")
+            option_values[uid] = entity.validate(
+                item.get("value"), self.program_engine.option_state(program_uid, uid)
+            )
+        states = {uid: dict(state) for uid, state in self.program_engine.select(program_uid)}
+        for uid, value_raw in option_values.items():
+            states.setdefault(uid, {})["value_raw"] = value_raw
+        if self._selected_program:
+            states[self._selected_program.uid] = self._selected_program.parse_state(
+                {"value_raw": program_uid}
+            )
+        _, values, description_changes = self._restore_states(states.items())
+        # The Options now match the Program, including those changed by other means
+        self.program_engine.changed.clear()
+        await self._send_changes(values, description_changes)
+
+    async def write_selected_program(self, data: Any) -> None:
+        """
+        Select a Program written by a client to /ro/selectedProgram.
+
+        Raises WriteRejectedError for malformed writes and as select_program().
+        """
+        items = _client_list(data)
+        item = items[0] if items else None
+        program_uid = _client_uid(item, "program")
+        options = item.get("options")
+        await self.select_program(program_uid, None if options is None else _client_list(options))
+
+    async def set_entity_state(self, uid: int, state: dict) -> None:
+        """
+        Set the state of an entity from the GUI, in dump() format.
+
+        A Program set as the SelectedProgram value is selected with select_program().
+        """
+        entity = self.entities_uid[uid]
+        parsed = entity.parse_state(state)
+        if entity is self._selected_program and "value_raw" in parsed:
+            await self.select_program(parsed.pop("value_raw"))
+        if parsed:
+            await self.apply_states([(uid, parsed)])
+
+    async def update_entities(self, data: list[dict]) -> list[Entity]:
+        """
+        Apply values written by a client.
+
+        All values are validated before any is applied, raises WriteRejectedError
+        for malformed writes and the first rejected value. Returns the changed entities.
+        """
+        states = []
+        for item in _client_list(data):
+            uid = _client_uid(item)
+            entity = self.entities_uid.get(uid)
+            if entity is None:
+                raise WriteRejectedError(uid, CODE_UNKNOWN_ENTITY, "Unknown entity")
+            states.append((uid, {"value_raw": entity.validate(item.get("value"))}))
+        return await self.apply_states(states)
 
     async def send(self, message: Message) -> None:
         for session in self.sessions:
             await session.send(message)
+
+    async def send_values(self, values: list[dict]) -> None:
+        """Send a /ro/values NOTIFY, serialized once for all Sessions."""
+        if not self.sessions:
+            return
+        template = self.wire.values(values)
+        for session in self.sessions:
+            await session.send_template(template)
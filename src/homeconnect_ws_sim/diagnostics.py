@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import logging
+from functools import cache
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+    from aiohttp import BodyPartReader
+
+_LOGGER = logging.getLogger(__name__)
+
+REDACTED = "**REDACTED**"
+
+CONFIG_ENTRY_PATHS = {
+    "data.entry_data.description": "description",
+    "data.entry_data.psk": "psk64",
+    "data.entry_data.aes_iv": "iv64",
+    "data.appliance_state.entities": "state",
+    "data.appliance_state.service_versions": "services",
+}
+"Config keys by JSON path in a Diagnostic Dump"
+
+PROFILE_JSON_PATHS = {"key": "psk64", "iv": "iv64"}
+"Config keys by JSON path in the JSON file of a Profile"
+
+_CONTAINER_START = {"start_map", "start_array"}
+_CONTAINER_END = {"end_map", "end_array"}
+
+
+@cache
+def _ijson() -> ModuleType | None:
+    """Import ijson on first use, None if it is not installed."""
+    try:
+        import ijson  # noqa: PLC0415
+        import ijson.common  # noqa: PLC0415
+    except ImportError:
+        return None
+    return ijson
+
+
+class _Extractor:
+    """Builds the values at the given paths from ijson events, everything else is skipped."""
+
+    def __init__(self, paths: dict[str, str]) -> None:
+        self._paths = paths
+        self._builder: Any = None
+        self._key: str | None = None
+        self._depth = 0
+        self.result: dict[str, Any] = {}
+
+    def feed(self, prefix: str, event: str, value: Any) -> None:
+        if self._builder is None:
+            if prefix not in self._paths or event == "map_key" or event in _CONTAINER_END:
+                return
+            key = self._paths[prefix]
+            if event not in _CONTAINER_START:
+                self.result[key] = value
+                return
+            self._builder = _ijson().common.ObjectBuilder()
+            self._key = key
+            self._depth = 0
+
+        self._builder.event(event, value)
+        if event in _CONTAINER_START:
+            self._depth += 1
+        elif event in _CONTAINER_END:
+            self._depth -= 1
+            if self._depth == 0:
+                self.result[self._key] = self._builder.value
+                self._builder = None
+
+
+class _FieldReader:
+    """File like wrapper for ijson around a multipart field."""
+
+    def __init__(self, field: BodyPartReader) -> None:
+        self._field = field
+
+    async def read(self, size: int) -> bytes:
+        # ijson probes the type of the reader with read(0), which read_chunk() rejects
+        if size <= 0:
+            return b""
+        return await self._field.read_chunk(size)
+
+
+def _extract_from_json(data: bytes, paths: dict[str, str]) -> dict[str, Any]:
+    """Extract the values at the given paths from a complete document."""
+    result = {}
+    document = json.loads(data.decode())
+    for path, key in paths.items():
+        value = document
+        for name in path.split("."):
+            if not isinstance(value, dict) or name not in value:
+                break
+            value = value[name]
+        else:
+            result[key] = value
+    return result
+
+
+def extract_file(file: BinaryIO, paths: dict[str, str]) -> dict[str, Any]:
+    """Extract the values at the given paths from a JSON file, incrementally if possible."""
+    ijson = _ijson()
+    if ijson is None:
+        return _extract_from_json(file.read(), paths)
+    extractor = _Extractor(paths)
+    for prefix, event, value in ijson.parse(file, use_float=True):
+        extractor.feed(prefix, event, value)
+    return extractor.result
+
+
+async def extract_field(field: BodyPartReader, paths: dict[str, str]) -> dict[str, Any]:
+    """Extract the values at the given paths from a JSON upload while it is received."""
+    ijson = _ijson()
+    if ijson is None:
+        return _extract_from_json(await field.read(), paths)
+    extractor = _Extractor(paths)
+    async for prefix, event, value in ijson.parse_async(_FieldReader(field), use_float=True):
+        extractor.feed(prefix, event, value)
+    return extractor.result
+
+
+def config_entry_config(values: dict[str, Any]) -> dict[str, Any]:
+    """Appliance config from the values extracted from a Diagnostic Dump."""
+    if values.get("iv64") in {None, REDACTED}:
+        values.pop("iv64", None)
+    missing = set(CONFIG_ENTRY_PATHS.values()) - values.keys() - {"iv64"}
+    if missing:
+        _LOGGER.warning("Missing %s in Diagnostic Dump", ", ".join(sorted(missing)))
+    return values
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+from base64 import urlsafe_b64encode
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from secrets import token_bytes
+from typing import TYPE_CHECKING
+
+from .appliance import SimAppliance
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+
+@dataclass(frozen=True)
+class RunningAppliance:
+    """Appliance started by run_appliances()."""
+
+    appliance: SimAppliance
+    host: str
+    port: int
+    psk64: str
+    iv64: str | None = None
+
+    @property
+    def url(self) -> str:
+        """Websocket URL of the Appliance."""
+        scheme = "ws" if self.iv64 else "wss"
+        return f"{scheme}://{self.host}:{self.port}/homeconnect"
+
+
+async def _start(config: dict, host: str) -> RunningAppliance:
+    psk64 = config.get("psk64") or urlsafe_b64encode(token_bytes(32)).decode().rstrip("=")
+    appliance = SimAppliance(
+        description=config["description"],
+        psk64=psk64,
+        iv64=config.get("iv64"),
+        services=config.get("services"),
+    )
+    if config.get("state"):
+        appliance.set_initial_state(config["state"])
+    await appliance.start(port=0, host=host)
+    return RunningAppliance(
+        appliance=appliance,
+        host=host,
+        port=appliance.port,
+        psk64=psk64,
+        iv64=appliance.iv64,
+    )
+
+
+@asynccontextmanager
+async def run_appliances(
+    *configs: dict, host: str = "127.0.0.1"
+) -> AsyncIterator[list[RunningAppliance]]:
+    """
+    Run Appliances in the running event loop on ephemeral ports.
+
+    Every config is a dict like the Appliance save file, with "description" and
+    optional "psk64", "iv64", "services" and "state". A random PSK is generated
+    when "psk64" is missing.
+
+    Example:
+    -------
+        async with run_appliances({"description": description}) as (dishwasher,):
+            client = HomeAppliance(description, dishwasher.host, ..., psk64=dishwasher.psk64)
+
+    Args:
+    ----
+        *configs (dict): Appliance configs
+        host (str): Host to bind to
+
+    """
+    results = await asyncio.gather(
+        *(_start(config, host) for config in configs), return_exceptions=True
+    )
+    running = [result for result in results if isinstance(result, RunningAppliance)]
+    try:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        yield running
+    finally:
+        await asyncio.gather(*(appliance.appliance.stop() for appliance in running))
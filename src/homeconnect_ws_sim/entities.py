@@ -1,20 +1,79 @@
 from __future__ import annotations
 
-import asyncio
+import math
 from abc import ABC
 from typing import TYPE_CHECKING, Any
 
 from homeconnect_websocket.entities import Access
 from homeconnect_websocket.helpers import TYPE_MAPPING
-from homeconnect_websocket.message import Action, Message
+
+from .events import ChangeType, EntityChangeEvent
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Coroutine
+    from collections.abc import Callable
 
     from homeconnect_websocket.entities import EntityDescription
 
     from .appliance import SimAppliance
 
+CODE_INVALID_VALUE = 400
+"Response code for values of wrong type, not in the enumeration or out of range"
+
+CODE_NOT_WRITABLE = 403
+"Response code for writes to Entities without write access or not available"
+
+CODE_UNKNOWN_ENTITY = 404
+"Response code for writes to unknown uids"
+
+WRITABLE_ACCESS = frozenset({Access.READ_WRITE, Access.WRITE_ONLY})
+
+
+class WriteRejectedError(ValueError):
+    """A client write was rejected, uid is None if the write is malformed."""
+
+    def __init__(self, uid: int | None, code: int, reason: str) -> None:
+        super().__init__(f"{reason} (uid {uid})")
+        self.uid = uid
+        self.code = code
+        "Response code"
+
+
+def _coercer(protocol_type: str | None, convert: Callable) -> Callable[[Any], Any]:
+    """Strict conversion of a client value to the protocol type."""
+    if protocol_type == "Boolean":
+
+        def coerce(value: Any) -> bool:
+            if not isinstance(value, bool):
+                raise TypeError
+            return value
+
+    elif protocol_type == "Integer":
+
+        def coerce(value: Any) -> int:
+            if isinstance(value, bool) or not isinstance(value, int | float):
+                raise TypeError
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError
+            return int(value)
+
+    elif protocol_type == "Float":
+
+        def coerce(value: Any) -> float:
+            if isinstance(value, bool) or not isinstance(value, int | float):
+                raise TypeError
+            return float(value)
+
+    elif protocol_type == "String":
+
+        def coerce(value: Any) -> str:
+            if not isinstance(value, str):
+                raise TypeError
+            return value
+
+    else:
+        coerce = convert
+    return coerce
+
 
 class Entity(ABC):
     """BaseEntity Class."""
@@ -22,21 +81,15 @@ class Entity(ABC):
     _appliance: SimAppliance
     _uid: int
     _name: str
-    _callbacks: set[Callable[[Entity], Coroutine]]
-    _tasks: set[asyncio.Task]
     _value: Any | None = None
     _enumeration: dict | None = None
     _rev_enumeration: dict
-    _description_change: dict[str]
 
     def __init__(self, description: EntityDescription, appliance: SimAppliance) -> None:
         self._appliance = appliance
         self._description = description
         self._uid = description["uid"]
         self._name = description["name"]
-        self._tasks = set()
-        self._callbacks = set()
-        self._description_change = {}
         self._protocol_type = description.get("protocolType")
         self._content_type = description.get("contentType")
         self._type = TYPE_MAPPING.get(description.get("protocolType"), lambda value: value)
@@ -47,12 +100,69 @@ class Entity(ABC):
             self._value = self._type(description["initValue"])
         if "default" in description:
             self._value = self._type(description["default"])
+        self._validator = self._compile_validator()
+
+    def _access_check(self) -> Callable[[Any, dict], Any]:
+        """Get the access step of the write validator, Entities without access are not writable."""
+        uid = self._uid
+
+        def check_access(_value: Any, _state: dict) -> Any:
+            raise WriteRejectedError(uid, CODE_NOT_WRITABLE, "Not writable")
+
+        return check_access
+
+    def _write_checks(self) -> list[Callable[[Any, dict], Any]]:
+        """
+        Get the steps of the write validator.
+
+        Each step gets the value and the state overrides and returns the value for the next step.
+        """
+        uid = self._uid
+        coerce = _coercer(self._protocol_type, self._type)
+
+        def check_type(value: Any, _state: dict) -> Any:
+            try:
+                return coerce(value)
+            except (TypeError, ValueError) as exc:
+                raise WriteRejectedError(uid, CODE_INVALID_VALUE, "Invalid type") from exc
+
+        checks = [self._access_check(), check_type]
+        if self._enumeration:
+            allowed = frozenset(self._enumeration)
+
+            def check_enum(value: Any, _state: dict) -> Any:
+                if value not in allowed:
+                    raise WriteRejectedError(uid, CODE_INVALID_VALUE, "Value not in Enum")
+                return value
+
+            checks.append(check_enum)
+        return checks
+
+    def _compile_validator(self) -> Callable[[Any, dict], Any]:
+        checks = tuple(self._write_checks())
+
+        def validator(value: Any, state: dict) -> Any:
+            for check in checks:
+                value = check(value, state)
+            return value
+
+        return validator
+
+    def validate(self, value: Any, state: dict | None = None) -> Any:
+        """
+        Coerce and check a value written by a client.
+
+        Access and ranges in state, in the format of restore(), are checked instead of the
+        current ones. Returns the raw value, raises WriteRejectedError.
+        """
+        return self._validator(value, {} if state is None else state)
 
     def dump(self) -> dict:
         """Dump Entity state."""
         return {
             "uid": self.uid,
             "name": self.name,
+            "type": type(self).__name__,
             "value": self.value,
             "value_raw": self.value_raw,
             "enum": self.enum,
@@ -60,47 +170,54 @@ class Entity(ABC):
             "contentType": self._content_type,
         }
 
-    async def set_state(self, state: dict) -> None:
-        if "value_raw" in state and state["value_raw"] is not None:
-            await self.set_value_raw(state["value_raw"])
-        if self._description_change:
-            self._description_change["uid"] = self._uid
-            message = Message(
-                resource="/ro/descriptionChange",
-                action=Action.NOTIFY,
-                data=[self._description_change],
-            )
-            await self._appliance.send(message)
-            self._description_change = {}
+    def snapshot(self) -> dict:
+        """Get the Entity state for restore()."""
+        return {"value_raw": self._value}
 
-    def get_description_changes(self) -> dict:
-        return {"uid": self._uid}
+    def restore(self, state: dict) -> dict:
+        """
+        Restore a state from snapshot() without sending messages.
 
-    async def update(self, values: dict) -> None:
-        """Update the entity state and execute callbacks."""
-        if "value" in values:
-            self._value = self._type(values["value"])
+        Missing keys are left unchanged. Returns the changed attributes, the value
+        as "value" and changed description attributes with their descriptionChange keys.
+        """
+        changes = {}
+        if "value_raw" in state and self._value != state["value_raw"]:
+            self._value = state["value_raw"]
+            changes["value"] = self._value
+            self._changed(ChangeType.VALUE)
+        return changes
 
-            message = Message(
-                resource="/ro/values",
-                action=Action.NOTIFY,
-                data={"uid": self._uid, "value": self._value},
-            )
-            await self._appliance.send(message)
+    def parse_state(self, state: dict) -> dict:
+        """
+        Convert a state in dump() format to the format of restore().
 
-        for callback in self._callbacks:
-            task = asyncio.create_task(callback(self))
-            self._tasks.add(task)
-            task.add_done_callback(self._tasks.remove)
+        The value can be given as "value_raw" or as "value", which is resolved
+        through the enumeration. Raises ValueError for invalid values.
+        """
+        parsed = {}
+        if state.get("value_raw") is not None:
+            parsed["value_raw"] = self._type(state["value_raw"])
+        elif state.get("value") is not None:
+            if self._enumeration:
+                if state["value"] not in self._rev_enumeration:
+                    msg = "Value not in Enum"
+                    raise ValueError(msg)
+                parsed["value_raw"] = self._rev_enumeration[state["value"]]
+            else:
+                parsed["value_raw"] = self._type(state["value"])
+        return parsed
+
+    def _changed(self, change_type: ChangeType) -> None:
+        """Publish a change event on the Appliance event bus."""
+        self._appliance.bus.publish(EntityChangeEvent(self, change_type))
 
-    def register_callback(self, callback: Callable[[Entity], Coroutine]) -> None:
-        """Register update callback."""
-        if callback not in self._callbacks:
-            self._callbacks.add(callback)
+    async def set_state(self, state: dict) -> None:
+        """Set the state from dump() format and notify the clients."""
+        await self._appliance.apply_states([(self._uid, self.parse_state(state))])
 
-    def unregister_callback(self, callback: Callable[[Entity], Coroutine]) -> None:
-        """Unregister update callback."""
-        self._callbacks.remove(callback)
+    def get_description_changes(self) -> dict:
+        return {"uid": self._uid}
 
     @property
     def uid(self) -> int:
@@ -147,12 +264,8 @@ class Entity(ABC):
         value_raw = self._type(value_raw)
         if self._value != value_raw:
             self._value = value_raw
-            message = Message(
-                resource="/ro/values",
-                action=Action.NOTIFY,
-                data={"uid": self._uid, "value": value_raw},
-            )
-            await self._appliance.send(message)
+            self._changed(ChangeType.VALUE)
+            await self._appliance.send_values([{"uid": self._uid, "value": value_raw}])
 
     @property
     def enum(self) -> dict[int, str] | None:
@@ -195,11 +308,37 @@ class AccessMixin(Entity):
             changes["access"] = self._access.value.upper()
         return changes
 
-    async def set_state(self, state: dict) -> None:
-        if "access" in state and self._access != Access(state["access"].lower()):
-            self._access = Access(state["access"].lower())
-            self._description_change["access"] = self._access.value.upper()
-        await super().set_state(state)
+    def snapshot(self) -> dict:
+        state = super().snapshot()
+        state["access"] = self._access
+        return state
+
+    def restore(self, state: dict) -> dict:
+        changes = super().restore(state)
+        if "access" in state and self._access != state["access"]:
+            self._access = state["access"]
+            changes["access"] = self._access.value.upper()
+            self._changed(ChangeType.ACCESS)
+        return changes
+
+    def _access_check(self) -> Callable[[Any, dict], Any]:
+        uid = self._uid
+
+        def check_access(value: Any, state: dict) -> Any:
+            if state.get("access", self._access) not in WRITABLE_ACCESS:
+                raise WriteRejectedError(uid, CODE_NOT_WRITABLE, "Not writable")
+            return value
+
+        return check_access
+
+    def parse_state(self, state: dict) -> dict:
+        parsed = super().parse_state(state)
+        if state.get("access") is not None:
+            if not isinstance(state["access"], str):
+                msg = "Access must be a string"
+                raise ValueError(msg)
+            parsed["access"] = Access(state["access"].lower())
+        return parsed
 
 
 class AvailableMixin(Entity):
@@ -237,11 +376,37 @@ class AvailableMixin(Entity):
             changes["available"] = self._available
         return changes
 
-    async def set_state(self, state: dict) -> None:
+    def snapshot(self) -> dict:
+        state = super().snapshot()
+        state["available"] = self._available
+        return state
+
+    def restore(self, state: dict) -> dict:
+        changes = super().restore(state)
         if "available" in state and self._available != state["available"]:
             self._available = state["available"]
-            self._description_change["available"] = self._available
-        await super().set_state(state)
+            changes["available"] = self._available
+            self._changed(ChangeType.AVAILABLE)
+        return changes
+
+    def _write_checks(self) -> list[Callable[[Any, dict], Any]]:
+        checks = super()._write_checks()
+        uid = self._uid
+
+        def check_available(value: Any, state: dict) -> Any:
+            if state.get("available", self._available) is False:
+                raise WriteRejectedError(uid, CODE_NOT_WRITABLE, "Not available")
+            return value
+
+        # Right after the access check, before the value is looked at
+        checks.insert(1, check_available)
+        return checks
+
+    def parse_state(self, state: dict) -> dict:
+        parsed = super().parse_state(state)
+        if state.get("available") is not None:
+            parsed["available"] = bool(state["available"])
+        return parsed
 
 
 class MinMaxMixin(Entity):
@@ -314,17 +479,59 @@ class MinMaxMixin(Entity):
 
         return changes
 
-    async def set_state(self, state: dict) -> None:
+    def snapshot(self) -> dict:
+        state = super().snapshot()
+        state["min"] = self._min
+        state["max"] = self._max
+        state["stepSize"] = self._step
+        return state
+
+    def restore(self, state: dict) -> dict:
+        changes = super().restore(state)
         if "min" in state and self._min != state["min"]:
-            self._min = self._min_max_type(state["min"])
-            self._description_change["min"] = self._min
+            self._min = state["min"]
+            changes["min"] = self._min
         if "max" in state and self._max != state["max"]:
-            self._max = self._min_max_type(state["max"])
-            self._description_change["max"] = self._max
+            self._max = state["max"]
+            changes["max"] = self._max
         if "stepSize" in state and self._step != state["stepSize"]:
-            self._step = self._min_max_type(state["stepSize"])
-            self._description_change["stepSize"] = self._step
-        await super().set_state(state)
+            self._step = state["stepSize"]
+            changes["stepSize"] = self._step
+        if "min" in changes or "max" in changes or "stepSize" in changes:
+            self._changed(ChangeType.MIN_MAX)
+        return changes
+
+    def _write_checks(self) -> list[Callable[[Any, dict], Any]]:
+        checks = super()._write_checks()
+        if self._protocol_type not in {"Integer", "Float"}:
+            return checks
+        uid = self._uid
+
+        def check_range(value: float, state: dict) -> float:
+            # Range and step can change at runtime, read them on every write
+            minimum = state.get("min", self._min)
+            maximum = state.get("max", self._max)
+            step = state.get("stepSize", self._step)
+            if (minimum is not None and value < minimum) or (
+                maximum is not None and value > maximum
+            ):
+                raise WriteRejectedError(uid, CODE_INVALID_VALUE, "Value out of range")
+            if step:
+                steps = (value - (minimum or 0)) / step
+                if not math.isclose(steps, round(steps), abs_tol=1e-9):
+                    raise WriteRejectedError(uid, CODE_INVALID_VALUE, "Value not on step")
+            return value
+
+        checks.append(check_range)
+        return checks
+
+    def parse_state(self, state: dict) -> dict:
+        parsed = super().parse_state(state)
+        for key, dump_key in (("min", "min"), ("max", "max"), ("stepSize", "step")):
+            value = state.get(key, state.get(dump_key))
+            if value is not None:
+                parsed[key] = self._min_max_type(value)
+        return parsed
 
 
 class Status(AccessMixin, AvailableMixin, MinMaxMixin, Entity):
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+_LOGGER = logging.getLogger(__name__)
+
+LOOP_IMPLEMENTATIONS = ("auto", "asyncio", "uvloop")
+
+
+@dataclass(frozen=True)
+class LoopOptions:
+    """Event loop implementation and tuning."""
+
+    implementation: str = "asyncio"
+    "'asyncio', 'uvloop' or 'auto' to use uvloop when installed"
+
+    executor_workers: int | None = None
+    "Size of the default executor, None for the asyncio default"
+
+    slow_callback: float | None = None
+    "Enable loop debug mode and log callbacks running longer than this (seconds)"
+
+
+def new_event_loop(options: LoopOptions | None = None) -> asyncio.AbstractEventLoop:
+    """Create a new event loop according to the options."""
+    options = options or LoopOptions()
+    loop = None
+    if options.implementation in {"auto", "uvloop"}:
+        try:
+            import uvloop  # noqa: PLC0415
+        except ImportError:
+            if options.implementation == "uvloop":
+                _LOGGER.warning("uvloop is not installed, falling back to asyncio")
+        else:
+            loop = uvloop.new_event_loop()
+    if loop is None:
+        loop = asyncio.new_event_loop()
+    _LOGGER.debug("Using %s", type(loop).__module__)
+
+    if options.executor_workers:
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=options.executor_workers))
+    if options.slow_callback is not None:
+        loop.set_debug(True)
+        loop.slow_callback_duration = options.slow_callback
+    return loop
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Iterable
+
+    from .entities import Entity
+
+
+class ChangeType(StrEnum):
+    """Changed Entity attribute."""
+
+    VALUE = "value"
+    ACCESS = "access"
+    AVAILABLE = "available"
+    MIN_MAX = "min_max"
+
+
+@dataclass(frozen=True, slots=True)
+class EntityChangeEvent:
+    """Change of an Entity attribute."""
+
+    entity: Entity
+    type: ChangeType
+
+
+class _Subscription:
+    __slots__ = ("batch", "callback", "types", "uids")
+
+    def __init__(
+        self,
+        callback: Callable,
+        types: frozenset[ChangeType] | None,
+        uids: frozenset[int] | None,
+        *,
+        batched: bool,
+    ) -> None:
+        self.callback = callback
+        self.types = types
+        self.uids = uids
+        self.batch: list[EntityChangeEvent] | None = [] if batched else None
+
+
+class EventBus:
+    """
+    Entity change events of an Appliance.
+
+    Synchronous subscribers are called while the change is published.
+    Batched subscribers are called once per event loop iteration with all
+    events published since the last call.
+    """
+
+    def __init__(self) -> None:
+        self._all: list[_Subscription] = []
+        self._by_uid: dict[int, list[_Subscription]] = {}
+        self._pending: list[_Subscription] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def subscribe(
+        self,
+        callback: Callable[[EntityChangeEvent], None],
+        *,
+        types: Iterable[ChangeType] | None = None,
+        uids: Iterable[int] | None = None,
+    ) -> Callable[[], None]:
+        """
+        Call callback synchronously for every matching event.
+
+        Returns a function to unsubscribe.
+
+        Args:
+        ----
+            callback (Callable): called with the event
+            types (Optional[Iterable[ChangeType]]): only these change types, default all
+            uids (Optional[Iterable[int]]): only these entities, default all
+
+        """
+        return self._add(_Subscription(callback, _frozen(types), _frozen(uids), batched=False))
+
+    def subscribe_batched(
+        self,
+        callback: Callable[[list[EntityChangeEvent]], Coroutine],
+        *,
+        types: Iterable[ChangeType] | None = None,
+        uids: Iterable[int] | None = None,
+    ) -> Callable[[], None]:
+        """
+        Call async callback once per loop iteration with the matching events.
+
+        Returns a function to unsubscribe.
+
+        Args:
+        ----
+            callback (Callable): coroutine function called with the list of events
+            types (Optional[Iterable[ChangeType]]): only these change types, default all
+            uids (Optional[Iterable[int]]): only these entities, default all
+
+        """
+        return self._add(_Subscription(callback, _frozen(types), _frozen(uids), batched=True))
+
+    def _add(self, subscription: _Subscription) -> Callable[[], None]:
+        if subscription.uids is None:
+            self._all.append(subscription)
+        else:
+            for uid in subscription.uids:
+                self._by_uid.setdefault(uid, []).append(subscription)
+
+        def unsubscribe() -> None:
+            if subscription.uids is None:
+                self._all.remove(subscription)
+            else:
+                for uid in subscription.uids:
+                    self._by_uid[uid].remove(subscription)
+
+        return unsubscribe
+
+    def publish(self, event: EntityChangeEvent) -> None:
+        """Publish an event."""
+        for subscription in self._all:
+            self._deliver(subscription, event)
+        for subscription in self._by_uid.get(event.entity.uid, ()):
+            self._deliver(subscription, event)
+
+    def _deliver(self, subscription: _Subscription, event: EntityChangeEvent) -> None:
+        if subscription.types is not None and event.type not in subscription.types:
+            return
+        if subscription.batch is None:
+            subscription.callback(event)
+            return
+        if not subscription.batch:
+            self._pending.append(subscription)
+            if self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+        subscription.batch.append(event)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending = self._pending
+        self._pending = []
+        for subscription in pending:
+            events = subscription.batch
+            subscription.batch = []
+            task = asyncio.create_task(subscription.callback(events))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+
+def _frozen(values: Iterable | None) -> frozenset | None:
+    return None if values is None else frozenset(values)
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+from .appliance import SimAppliance
+from .event_loop import LoopOptions, new_event_loop
+from .heartbeat import HEARTBEAT_PROFILES, HeartbeatOptions
+from .log import LogOptions, setup_logging
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from .events import EntityChangeEvent
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _run_worker(
+    shard: list[tuple[int, int, dict]],
+    conn: Connection,
+    loop_options: LoopOptions,
+    log_options: LogOptions,
+    heartbeat: HeartbeatOptions,
+) -> None:
+    """Entry point of a Fleet worker process."""
+    setup_logging(log_options)
+    loop = new_event_loop(loop_options)
+    worker = FleetWorker(shard, conn, loop, heartbeat=heartbeat)
+    loop.run_until_complete(worker.start())
+    loop.run_forever()
+
+
+class FleetWorker:
+    """Runs a shard of Appliances in a worker process."""
+
+    appliances: dict[int, SimAppliance]
+    "Appliances by fleet id"
+
+    mirrored: set[int]
+    "fleet ids of the Appliances whose state the supervisor has fetched"
+
+    def __init__(
+        self,
+        shard: list[tuple[int, int, dict]],
+        conn: Connection,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        heartbeat: HeartbeatOptions | None = None,
+    ) -> None:
+        """
+        Fleet worker.
+
+        Args:
+        ----
+            shard (list[tuple[int, int, dict]]): fleet id, port and config of each Appliance
+            conn (Connection): Pipe to the supervisor
+            loop (AbstractEventLoop): Event loop of the worker process
+            heartbeat (Optional[HeartbeatOptions]): Ping and idle-timeout settings of the Appliances
+
+        """
+        self._shard = shard
+        self._heartbeat = heartbeat
+        self._conn = conn
+        self._loop = loop
+        self._tasks: set[asyncio.Task] = set()
+        self.appliances = {}
+        self.mirrored = set()
+
+    async def start(self) -> None:
+        await asyncio.gather(
+            *(
+                self._start_appliance(appliance_id, port, config)
+                for appliance_id, port, config in self._shard
+            )
+        )
+        self._loop.add_reader(self._conn.fileno(), self._on_command)
+        _LOGGER.info("Worker started %s Appliances", len(self.appliances))
+
+    async def _start_appliance(self, appliance_id: int, port: int, config: dict) -> None:
+        appliance = SimAppliance(
+            description=config["description"],
+            psk64=config["psk64"],
+            iv64=config.get("iv64"),
+            services=config.get("services"),
+        )
+        if self._heartbeat is not None:
+            appliance.heartbeat = self._heartbeat
+        if config.get("state"):
+            appliance.set_initial_state(config["state"])
+        appliance.bus.subscribe_batched(partial(self._entity_events, appliance_id))
+        await appliance.start(loop=self._loop, port=port)
+        self.appliances[appliance_id] = appliance
+        # The entities are created on first use, the state is sent when requested
+        self._conn.send(("started", appliance_id, None))
+
+    async def _entity_events(self, appliance_id: int, events: list[EntityChangeEvent]) -> None:
+        # The supervisor only keeps the state of fetched Appliances, skip the others
+        if appliance_id not in self.mirrored:
+            return
+        entities = {event.entity.uid: event.entity for event in events}
+        self._conn.send(("update", appliance_id, [entity.dump() for entity in entities.values()]))
+
+    def _on_command(self) -> None:
+        try:
+            command, appliance_id, uid, state = self._conn.recv()
+        except EOFError:
+            # Supervisor is gone
+            self._loop.remove_reader(self._conn.fileno())
+            self._loop.stop()
+            return
+        if command == "set":
+            task = self._loop.create_task(self._set_state(appliance_id, uid, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.remove)
+        elif command == "set_many":
+            task = self._loop.create_task(self._set_states(appliance_id, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.remove)
+        elif command == "dump":
+            self.mirrored.add(appliance_id)
+            self._conn.send(
+                ("init", appliance_id, self.appliances[appliance_id].dump()["entities"])
+            )
+
+    async def _set_state(self, appliance_id: int, uid: int, state: dict) -> None:
+        try:
+            await self.appliances[appliance_id].set_entity_state(uid, state)
+        except (KeyError, ValueError, TypeError):
+            _LOGGER.warning("Invalid state for entity %s of Appliance %s", uid, appliance_id)
+
+    async def _set_states(self, appliance_id: int, states: list[dict]) -> None:
+        try:
+            await self.appliances[appliance_id].set_state(states)
+        except (KeyError, ValueError, TypeError):
+            _LOGGER.warning("Invalid state for Appliance %s", appliance_id)
+
+
+class FleetSupervisor:
+    """Starts worker processes and mirrors the state of their Appliances."""
+
+    states: dict[int, dict[int, dict]]
+    "Mirrored entity state by fleet id and uid, Appliances are mirrored once fetched"
+
+    ports: dict[int, int]
+    "Appliance ports by fleet id"
+
+    started: asyncio.Future[float]
+    "Resolved with the startup time in seconds once all Appliances are listening"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        configs: list[dict],
+        workers: int,
+        base_port: int,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        update_callback: Callable[[int, list[dict] | None], Coroutine] | None = None,
+        loop_options: LoopOptions | None = None,
+        log_options: LogOptions | None = None,
+        heartbeat: HeartbeatOptions | None = None,
+    ) -> None:
+        """
+        Fleet supervisor.
+
+        Every worker owns a contiguous range of Appliances and ports,
+        Appliance n listens on base_port + n.
+
+        Args:
+        ----
+            configs (list[dict]): Appliance configs
+            workers (int): Number of worker processes
+            base_port (int): Port of the first Appliance
+            loop (AbstractEventLoop): Event loop
+            update_callback (Optional[Callable]): called with the fleet id and the changed
+                entity states, or None after the full state of an Appliance has been fetched
+            loop_options (Optional[LoopOptions]): Event loop options of the workers
+            log_options (Optional[LogOptions]): Logging options of the workers
+            heartbeat (Optional[HeartbeatOptions]): Ping and idle-timeout settings of the Appliances
+
+        """
+        self._configs = configs
+        self._workers = max(1, min(workers, len(configs)))
+        self._base_port = base_port
+        self._loop = loop
+        self._update_callback = update_callback
+        self._loop_options = loop_options or LoopOptions()
+        self._log_options = log_options or LogOptions()
+        self._heartbeat = heartbeat or HEARTBEAT_PROFILES["aiohttp"]
+        self._processes: list[BaseProcess] = []
+        self._conns: list[Connection] = []
+        self._appliance_conn: dict[int, Connection] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._started = 0
+        self._fetching: dict[int, asyncio.Future[None]] = {}
+        self.states = {}
+        self.ports = {}
+        self.started = loop.create_future()
+
+    def start(self) -> None:
+        self._start_time = time.monotonic()
+        context = multiprocessing.get_context("spawn")
+        shard_size, remainder = divmod(len(self._configs), self._workers)
+        start = 0
+        for worker in range(self._workers):
+            end = start + shard_size + (1 if worker < remainder else 0)
+            shard = [
+                (appliance_id, self._base_port + appliance_id, self._configs[appliance_id])
+                for appliance_id in range(start, end)
+            ]
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_run_worker,
+                args=(shard, child_conn, self._loop_options, self._log_options, self._heartbeat),
+                name=f"homeconnect_ws_sim-worker-{worker}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            for appliance_id, port, _ in shard:
+                self._appliance_conn[appliance_id] = parent_conn
+                self.ports[appliance_id] = port
+            self._processes.append(process)
+            self._conns.append(parent_conn)
+            self._loop.add_reader(parent_conn.fileno(), partial(self._on_message, parent_conn))
+            _LOGGER.info(
+                "Started worker %s with Appliances %s to %s, ports %s to %s",
+                worker,
+                start,
+                end - 1,
+                self._base_port + start,
+                self._base_port + end - 1,
+            )
+            start = end
+
+    def _on_message(self, conn: Connection) -> None:
+        try:
+            message, appliance_id, data = conn.recv()
+        except EOFError:
+            self._worker_exited(conn)
+            return
+
+        if message == "started":
+            self._started += 1
+            if self._started == len(self._configs):
+                elapsed = time.monotonic() - self._start_time
+                _LOGGER.info("Started %s Appliances in %.3fs", len(self._configs), elapsed)
+                if not self.started.done():
+                    self.started.set_result(elapsed)
+        elif message == "init":
+            self.states[appliance_id] = {entity["uid"]: entity for entity in data}
+            future = self._fetching.pop(appliance_id, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+            self._run_callback(appliance_id, None)
+        elif message == "update" and appliance_id in self.states:
+            for entity in data:
+                self.states[appliance_id][entity["uid"]] = entity
+            self._run_callback(appliance_id, data)
+
+    def _worker_exited(self, conn: Connection) -> None:
+        """Drop the Appliances of an exited worker and fail their pending fetches."""
+        self._loop.remove_reader(conn.fileno())
+        lost = [
+            appliance_id
+            for appliance_id, appliance_conn in self._appliance_conn.items()
+            if appliance_conn is conn
+        ]
+        _LOGGER.warning("Worker of Appliances %s to %s exited", lost[0], lost[-1])
+        for appliance_id in lost:
+            del self._appliance_conn[appliance_id]
+            self.ports.pop(appliance_id, None)
+            self.states.pop(appliance_id, None)
+            future = self._fetching.pop(appliance_id, None)
+            if future is not None and not future.done():
+                future.set_exception(KeyError(appliance_id))
+
+    def _run_callback(self, appliance_id: int, entities: list[dict] | None) -> None:
+        if self._update_callback:
+            task = self._loop.create_task(self._update_callback(appliance_id, entities))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.remove)
+
+    async def fetch_states(self, appliance_id: int) -> dict[int, dict]:
+        """
+        Get the entity states of a fleet Appliance, mirroring them on first use.
+
+        Raises KeyError if the Appliance is not running, also if its worker exits while
+        the states are fetched.
+        """
+        if appliance_id not in self.states:
+            if appliance_id not in self._fetching:
+                self._fetching[appliance_id] = self._loop.create_future()
+                self._appliance_conn[appliance_id].send(("dump", appliance_id, None, None))
+            await asyncio.shield(self._fetching[appliance_id])
+        return self.states[appliance_id]
+
+    def set_state(self, appliance_id: int, uid: int, state: dict) -> None:
+        """Set the state of an entity of a fleet Appliance, raises KeyError if not running."""
+        self._appliance_conn[appliance_id].send(("set", appliance_id, uid, state))
+
+    def set_states(self, appliance_id: int, states: list[dict]) -> None:
+        """
+        Set the state of multiple entities of a fleet Appliance as one batch.
+
+        Raises KeyError if the Appliance is not running.
+        """
+        self._appliance_conn[appliance_id].send(("set_many", appliance_id, None, states))
+
+    def stop(self) -> None:
+        for conn in self._conns:
+            self._loop.remove_reader(conn.fileno())
+            conn.close()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes.clear()
+        self._conns.clear()
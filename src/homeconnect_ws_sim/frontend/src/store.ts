@@ -9,6 +9,11 @@ export const useStore = defineStore('store', {
     update_entity(message: WsMessage) {
       this.entities[message.entity.uid] = message.entity
     },
+    update_entities(message: WsMessage) {
+      for (const entity of message.entities) {
+        this.entities[entity.uid] = entity
+      }
+    },
     init_entities(message: WsMessage) {
       this.$reset()
       let idx
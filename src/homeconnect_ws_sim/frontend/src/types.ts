@@ -104,7 +104,7 @@ export interface Entity {
 
 // WS Message
 export interface WsMessage {
-  action: 'init' | 'update'
+  action: 'init' | 'update' | 'updates'
   entities: Entity[]
   entity: Entity
 }
@@ -6,6 +6,7 @@ class Ws {
   async ws_init() {
     const url = new URL('/api/ws', window.location.origin)
     url.protocol = 'ws:'
+    url.search = window.location.search
     console.log('Starting connection to WebSocket')
     this.websocket = new WebSocket(url)
     this.websocket.onmessage = this.ws_onmessage
@@ -28,6 +29,9 @@ class Ws {
     if (message.action == 'update') {
       useStore().update_entity(message)
     }
+    if (message.action == 'updates') {
+      useStore().update_entities(message)
+    }
   }
   async send(data: object) {
     this.websocket?.send(JSON.stringify(data))
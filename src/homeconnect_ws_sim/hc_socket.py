@@ -1,34 +1,99 @@
 from __future__ import annotations
 
+import hmac
 import logging
+from base64 import urlsafe_b64decode
+from secrets import token_bytes
+from typing import TYPE_CHECKING, NamedTuple
 
 import aiohttp
 from aiohttp import web
 
+from .log import WIRE_LOGGER, WireLogLimiter
+from .network import NetworkConditions, NetworkShaper
+from .ws_compression import WebSocketSender
+
+if TYPE_CHECKING:
+    from .heartbeat import SessionLiveness
+
 
 class SimSocket:
+    _shaper: NetworkShaper | None = None
+
     def __init__(
-        self, host: str, websocket: web.WebSocketResponse, logger: logging.Logger | None = None
+        self,
+        host: str,
+        websocket: web.WebSocketResponse,
+        logger: logging.Logger | None = None,
+        *,
+        sender: WebSocketSender | None = None,
+        liveness: SessionLiveness | None = None,
     ):
         self._websocket = websocket
+        self._liveness = liveness
+        self._sender = sender or WebSocketSender(websocket)
         self._host = host
 
         if logger is None:
             self._logger = logging.getLogger(__name__)
         else:
             self._logger = logger.getChild("socket")
+        self._wire_logger = logging.getLogger(WIRE_LOGGER)
+        self._wire_limiter = WireLogLimiter()
+
+    def _trace(self, direction: str, message: str | bytes) -> None:
+        """Log a message trace, subject to the wire log level and rate limit."""
+        if not self._wire_logger.isEnabledFor(logging.DEBUG) or not self._wire_limiter.allow():
+            return
+        if self._wire_limiter.suppressed:
+            self._wire_logger.debug(
+                "%s %s: %s messages not traced",
+                direction,
+                self._host,
+                self._wire_limiter.suppressed,
+            )
+            self._wire_limiter.suppressed = 0
+        self._wire_logger.debug("%s %s: %s", direction, self._host, message)
+
+    def set_network_conditions(self, conditions: NetworkConditions | None) -> None:
+        """Emulate network conditions, None to disable."""
+        if self._shaper is not None:
+            self._shaper.cancel()
+        if conditions is None:
+            self._shaper = None
+        else:
+            self._shaper = NetworkShaper(conditions, self._write_websocket, self.close)
+
+    async def _write_websocket(self, frame: str | bytes) -> None:
+        if isinstance(frame, bytes):
+            await self._sender.send_bytes(frame)
+        else:
+            await self._sender.send_str(frame)
+
+    async def _write(self, frame: str | bytes) -> None:
+        """Write a frame, through the network emulation if enabled."""
+        if self._shaper is None:
+            await self._write_websocket(frame)
+        else:
+            self._shaper.send(frame)
 
     async def send(self, message: str) -> None:
         """Send message."""
-        self._logger.debug("Send     %s: %s", self._host, message)
-        await self._websocket.send_str(message)
+        self._trace("Send    ", message)
+        await self._write(message)
 
     async def _receive(self, message: aiohttp.WSMessage) -> str:
-        self._logger.debug("Received %s: %s", self._host, str(message.data))
+        self._trace("Received", message.data)
         if message.type == aiohttp.WSMsgType.ERROR:
             raise message.data
         return str(message.data)
 
+    async def close(self) -> None:
+        """Close the underlying websocket."""
+        if self._shaper is not None:
+            self._shaper.cancel()
+        await self._websocket.close()
+
     @property
     def closed(self) -> bool:
         """True if underlying websocket is closed."""
@@ -40,5 +105,105 @@ class SimSocket:
         return self
 
     async def __anext__(self) -> str:
-        msg = await self._websocket.__anext__()
-        return await self._receive(msg)
+        while True:
+            msg = await self._websocket.__anext__()
+            if self._liveness is not None and not self._liveness.received(msg):
+                continue
+            # Decoded before frames are dropped, the AES chains include every sent frame
+            message = await self._receive(msg)
+            if self._shaper is None or await self._shaper.receive(len(msg.data)):
+                return message
+
+
+class AesKeys(NamedTuple):
+    """Key material for AES encrypted Connections, derived once per Appliance."""
+
+    enckey: bytes
+    mac: hmac.HMAC
+    iv: bytes
+
+
+def derive_aes_keys(psk64: str, iv64: str) -> AesKeys:
+    """Derive encryption key and HMAC base state from PSK and IV."""
+    psk = urlsafe_b64decode(psk64 + "===")
+    iv = urlsafe_b64decode(iv64 + "===")
+    enckey = hmac.digest(psk, b"ENC", digest="sha256")
+    mackey = hmac.digest(psk, b"MAC", digest="sha256")
+    # Every frame HMAC starts with the IV, keep the keyed state with the IV absorbed
+    return AesKeys(enckey=enckey, mac=hmac.new(mackey, iv, "sha256"), iv=iv)
+
+
+class AesSimSocket(SimSocket):
+    """Socket for AES encrypted Connection."""
+
+    _last_rx_hmac: bytes
+    _last_tx_hmac: bytes
+
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str,
+        websocket: web.WebSocketResponse,
+        keys: AesKeys,
+        logger: logging.Logger | None = None,
+        *,
+        sender: WebSocketSender | None = None,
+        liveness: SessionLiveness | None = None,
+    ) -> None:
+        from Crypto.Cipher import AES  # noqa: PLC0415
+
+        super().__init__(host, websocket, logger, sender=sender, liveness=liveness)
+        self._mac = keys.mac
+        # CBC chaining continues across frames, the ciphers live as long as the Session
+        self._aes_encrypt = AES.new(keys.enckey, AES.MODE_CBC, keys.iv)
+        self._aes_decrypt = AES.new(keys.enckey, AES.MODE_CBC, keys.iv)
+        self._last_rx_hmac = bytes(16)
+        self._last_tx_hmac = bytes(16)
+
+    def _hmac(self, direction: bytes, last_hmac: bytes, enc_msg: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(direction)
+        mac.update(last_hmac)
+        mac.update(enc_msg)
+        return mac.digest()[0:16]
+
+    async def _write_websocket(self, frame: str | bytes) -> None:
+        # Encrypted when written, after the network emulation dropped or queued
+        # the frame, so the CBC and HMAC chains only include frames that are sent
+        clear_msg = frame.encode() if isinstance(frame, str) else frame
+        pad_len = 16 - (len(clear_msg) % 16)
+        if pad_len == 1:
+            pad_len += 16
+        clear_msg = clear_msg + b"\x00" + token_bytes(pad_len - 2) + bytes([pad_len])
+        enc_msg = self._aes_encrypt.encrypt(clear_msg)
+        self._last_tx_hmac = self._hmac(b"C", self._last_tx_hmac, enc_msg)
+        await self._sender.send_bytes(enc_msg + self._last_tx_hmac)
+
+    async def _receive(self, message: aiohttp.WSMessage) -> str:
+        if message.type == aiohttp.WSMsgType.ERROR:
+            raise message.data
+        buf = message.data
+        if not isinstance(buf, bytes):
+            msg = "Message not encrypted"
+            raise TypeError(msg)
+        if len(buf) < 32:  # noqa: PLR2004
+            msg = "Message to short"
+            raise ValueError(msg)
+        if len(buf) % 16 != 0:
+            msg = "Unaligned Message"
+            raise ValueError(msg)
+
+        enc_msg = buf[0:-16]
+        recv_hmac = buf[-16:]
+        if not hmac.compare_digest(recv_hmac, self._hmac(b"E", self._last_rx_hmac, enc_msg)):
+            msg = "HMAC Failure"
+            raise ValueError(msg)
+        self._last_rx_hmac = recv_hmac
+
+        clear_msg = self._aes_decrypt.decrypt(enc_msg)
+        pad_len = clear_msg[-1]
+        if len(clear_msg) < pad_len:
+            msg = "Padding Error"
+            raise ValueError(msg)
+        decoded = clear_msg[0:-pad_len].decode()
+        self._trace("Received", decoded)
+        return decoded
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING
+from weakref import WeakKeyDictionary
+
+from aiohttp import WSCloseCode, WSMsgType
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from aiohttp import WSMessage, web
+
+_LOGGER = logging.getLogger(__name__)
+
+_OPCODE_PING = 0x89
+_OPCODE_PONG = 0x8A
+_PING_PAYLOAD = struct.Struct("!d")
+_MAX_SLOTS = 64
+_MIN_TICK = 0.1
+
+
+@dataclass(frozen=True)
+class HeartbeatOptions:
+    """Ping and idle-timeout settings of websocket sessions."""
+
+    interval: float | None = 2.0
+    "Ping interval in seconds, None to send no pings"
+
+    missed_pongs: int = 1
+    "Close the websocket when this many pings in a row were not answered"
+
+    idle_timeout: float | None = None
+    "Close the websocket when no message was received for this many seconds, None to disable"
+
+    @property
+    def period(self) -> float | None:
+        """Interval at which every session is checked, idle-timeouts are checked at pings."""
+        return self.interval or self.idle_timeout
+
+
+HEARTBEAT_PROFILES = {
+    "aiohttp": HeartbeatOptions(interval=2.0, missed_pongs=1),
+    "appliance": HeartbeatOptions(interval=30.0, missed_pongs=2),
+    "off": HeartbeatOptions(interval=None),
+}
+"""
+Heartbeat profiles.
+
+'aiohttp' pings every 2 seconds like aiohttp's heartbeat=2, 'appliance' approximates
+real Appliances which ping rarely and tolerate a missed pong, 'off' sends no pings.
+"""
+
+
+class SessionLiveness:
+    """Liveness metrics of a websocket, pings are sent by the HeartbeatWheel."""
+
+    def __init__(
+        self,
+        websocket: web.WebSocketResponse,
+        transport: asyncio.Transport | None,
+        *,
+        on_rtt: Callable[[float], None] | None = None,
+    ) -> None:
+        self._websocket = websocket
+        self._transport = transport
+        self._on_rtt = on_rtt
+        self._loop = asyncio.get_running_loop()
+        self.connected = self._loop.time()
+        self.last_received = self.connected
+        "Loop time of the last received frame, including pongs"
+        self.last_message = self.connected
+        "Loop time of the last received message"
+        self.pings_sent = 0
+        self.pongs_received = 0
+        self.unanswered = 0
+        "Pings sent since the last pong"
+        self.rtt: float | None = None
+        "Round trip time of the last answered ping"
+        self.evicted: str | None = None
+        "Reason the websocket was closed by the heartbeat"
+
+    def received(self, message: WSMessage) -> bool:
+        """Record a received frame, returns False for pings and pongs."""
+        now = self._loop.time()
+        self.last_received = now
+        if message.type == WSMsgType.PING:
+            self._write_control(_OPCODE_PONG, message.data)
+            return False
+        if message.type == WSMsgType.PONG:
+            self.pongs_received += 1
+            self.unanswered = 0
+            if len(message.data) == _PING_PAYLOAD.size:
+                self.rtt = now - _PING_PAYLOAD.unpack(message.data)[0]
+                if self._on_rtt is not None:
+                    self._on_rtt(self.rtt)
+            return False
+        self.last_message = now
+        return True
+
+    def ping(self) -> None:
+        self.pings_sent += 1
+        self.unanswered += 1
+        self._write_control(_OPCODE_PING, _PING_PAYLOAD.pack(self._loop.time()))
+
+    def _write_control(self, opcode: int, payload: bytes) -> None:
+        # Control frames are written directly, no coroutine per ping
+        if self._transport is None or self._transport.is_closing() or self._websocket.closed:
+            return
+        self._transport.write(bytes([opcode, len(payload)]) + payload)
+
+    async def close(self) -> None:
+        await self._websocket.close(code=WSCloseCode.GOING_AWAY)
+
+    def metrics(self) -> dict:
+        """Liveness metrics."""
+        now = self._loop.time()
+        return {
+            "age": now - self.connected,
+            "idle": now - self.last_message,
+            "last_received": now - self.last_received,
+            "pings_sent": self.pings_sent,
+            "pongs_received": self.pongs_received,
+            "unanswered": self.unanswered,
+            "rtt": self.rtt,
+            "evicted": self.evicted,
+        }
+
+
+class HeartbeatWheel:
+    """
+    Timer wheel driving pings and idle-timeouts of all sessions with the same options.
+
+    The check period is split into slots, each session belongs to one slot. One timer
+    handles one slot per tick, so every session is visited once per period and the
+    event loop holds a single timer no matter how many sessions there are.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, options: HeartbeatOptions) -> None:
+        self._loop = loop
+        self._options = options
+        period = options.period
+        self._slots: list[set[SessionLiveness]] = [
+            set() for _ in range(max(1, min(_MAX_SLOTS, round(period / _MIN_TICK))))
+        ]
+        self._tick = period / len(self._slots)
+        self._slot_of: dict[SessionLiveness, int] = {}
+        self._position = 0
+        self._next_tick = 0.0
+        self._handle: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, liveness: SessionLiveness) -> None:
+        """Start monitoring a session, it is first visited after one period."""
+        slot = self._position
+        self._slots[slot].add(liveness)
+        self._slot_of[liveness] = slot
+        if self._handle is None:
+            self._next_tick = self._loop.time() + self._tick
+            self._handle = self._loop.call_at(self._next_tick, self._run)
+
+    def remove(self, liveness: SessionLiveness) -> None:
+        slot = self._slot_of.pop(liveness, None)
+        if slot is not None:
+            self._slots[slot].discard(liveness)
+        if not self._slot_of and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _run(self) -> None:
+        self._position = (self._position + 1) % len(self._slots)
+        now = self._loop.time()
+        options = self._options
+        for liveness in tuple(self._slots[self._position]):
+            if options.idle_timeout and now - liveness.last_message > options.idle_timeout:
+                self._evict(liveness, "idle")
+            elif options.interval and liveness.unanswered >= options.missed_pongs:
+                self._evict(liveness, "no pong")
+            elif options.interval:
+                liveness.ping()
+        if not self._slot_of:
+            self._handle = None
+            return
+        # Scheduled from the previous tick so the wheel does not drift
+        self._next_tick = max(self._next_tick + self._tick, now)
+        self._handle = self._loop.call_at(self._next_tick, self._run)
+
+    def _evict(self, liveness: SessionLiveness, reason: str) -> None:
+        _LOGGER.info("Closing websocket, %s", reason)
+        liveness.evicted = reason
+        self.remove(liveness)
+        task = self._loop.create_task(liveness.close())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+_WHEELS: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[HeartbeatOptions, HeartbeatWheel]] = (
+    WeakKeyDictionary()
+)
+
+
+def get_wheel(options: HeartbeatOptions) -> HeartbeatWheel | None:
+    """Get the HeartbeatWheel of the running loop for options, None if nothing is checked."""
+    if options.period is None:
+        return None
+    wheels = _WHEELS.setdefault(asyncio.get_running_loop(), {})
+    if options not in wheels:
+        wheels[options] = HeartbeatWheel(asyncio.get_running_loop(), options)
+    return wheels[options]
+
+
+def watch(liveness: SessionLiveness, options: HeartbeatOptions) -> Callable[[], None]:
+    """
+    Ping and check a session on the shared wheel of its options.
+
+    Returns a function to stop watching.
+    """
+    wheel = get_wheel(options)
+    if wheel is None:
+        return lambda: None
+    wheel.add(liveness)
+    return partial(wheel.remove, liveness)
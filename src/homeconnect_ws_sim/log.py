@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import time
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+WIRE_LOGGER = "homeconnect_ws_sim.wire"
+"Logger for message traces, separate from the application log"
+
+LOG_FORMAT = "%(asctime)s %(message)s"
+
+
+@dataclass(frozen=True)
+class LogOptions:
+    """Logging configuration."""
+
+    level: str = "DEBUG"
+    "Level of the application log"
+
+    wire_level: str | None = None
+    "Level of the message trace log, None to use the application log level"
+
+    wire_rate: float | None = None
+    "Maximum traced messages per second and session, None for no limit"
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The default QueueHandler formats the record in the calling thread,
+    which is the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(options: LogOptions | None = None) -> QueueListener:
+    """
+    Configure logging to write from a background thread.
+
+    Records are put on a queue by the event loop thread and formatted and
+    written by a QueueListener thread.
+    """
+    options = options or LogOptions()
+    queue = SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(queue, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(queue))
+    root.setLevel(options.level)
+    logging.getLogger(WIRE_LOGGER).setLevel(options.wire_level or options.level)
+    WireLogLimiter.default_rate = options.wire_rate
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class WireLogLimiter:
+    """Token bucket limiting the message traces of one session."""
+
+    default_rate: float | None = None
+    "Rate used when none is given, set by setup_logging"
+
+    def __init__(self, rate: float | None = None, burst: float | None = None) -> None:
+        """
+        Token bucket limiting the message traces of one session.
+
+        Args:
+        ----
+            rate (Optional[float]): Messages per second, defaults to default_rate
+            burst (Optional[float]): Bucket size, defaults to rate
+
+        """
+        self._rate = rate or self.default_rate
+        self._burst = max(burst or self._rate or 0, 1)
+        self._tokens = self._burst
+        self._last = time.monotonic()
+        self.suppressed = 0
+        "Messages not traced since the last traced message"
+
+    def allow(self) -> bool:
+        """Take a token, returns False if the message should not be traced."""
+        if self._rate is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.suppressed += 1
+        return False
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING
+from weakref import WeakKeyDictionary
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class NetworkConditions:
+    """Emulated network conditions, applied to each direction of a Session."""
+
+    latency: float = 0.0
+    "Added delay in seconds"
+
+    jitter: float = 0.0
+    "Random additional delay of up to this many seconds"
+
+    bandwidth: float | None = None
+    "Bandwidth in bytes per second, None for unlimited"
+
+    burst: int = 0
+    "Bytes that can be sent at once before the bandwidth limit applies"
+
+    queue_limit: int | None = None
+    "Maximum number of queued frames, further frames are dropped"
+
+    loss: float = 0.0
+    "Probability of a frame being dropped"
+
+    disconnect: float = 0.0
+    "Probability of the connection being closed on a frame"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> NetworkConditions:
+        """Create from a dict, unknown keys are ignored."""
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+class TimerScheduler:
+    """
+    Shared timer for all shaped Sessions of an event loop.
+
+    Pending wake-ups are kept in one heap, only the earliest one is armed
+    on the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._heap: list[tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._handle: asyncio.TimerHandle | None = None
+
+    def wait_until(self, when: float) -> asyncio.Future:
+        """Get a Future that is resolved at loop time when."""
+        future = self._loop.create_future()
+        if when <= self._loop.time():
+            future.set_result(None)
+            return future
+        heapq.heappush(self._heap, (when, next(self._counter), future))
+        if self._handle is None or when < self._handle.when():
+            self._arm(when)
+        return future
+
+    def _arm(self, when: float) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = self._loop.call_at(when, self._run)
+
+    def _run(self) -> None:
+        self._handle = None
+        now = self._loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)
+        if self._heap:
+            self._arm(self._heap[0][0])
+
+
+_SCHEDULERS: WeakKeyDictionary[asyncio.AbstractEventLoop, TimerScheduler] = WeakKeyDictionary()
+
+
+def get_scheduler() -> TimerScheduler:
+    """Get the TimerScheduler of the running loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _SCHEDULERS:
+        _SCHEDULERS[loop] = TimerScheduler(loop)
+    return _SCHEDULERS[loop]
+
+
+class _Direction:
+    """Delay calculation for one direction, token bucket and in order delivery."""
+
+    def __init__(self, conditions: NetworkConditions, loop: asyncio.AbstractEventLoop) -> None:
+        self._conditions = conditions
+        self._loop = loop
+        self._tokens = float(conditions.burst)
+        self._bucket_time = loop.time()
+        self._last_delivery = 0.0
+
+    def delivery_time(self, size: int) -> float:
+        """Loop time at which a frame of size bytes arrives."""
+        conditions = self._conditions
+        now = self._loop.time()
+        departure = now
+        if conditions.bandwidth:
+            start = max(now, self._bucket_time)
+            tokens = min(
+                max(conditions.burst, size),
+                self._tokens + (start - self._bucket_time) * conditions.bandwidth,
+            )
+            departure = start
+            if tokens < size:
+                departure += (size - tokens) / conditions.bandwidth
+                tokens = size
+            self._tokens = tokens - size
+            self._bucket_time = departure
+
+        delivery = departure + conditions.latency
+        if conditions.jitter:
+            delivery += random.uniform(0, conditions.jitter)  # noqa: S311
+        # Frames do not overtake each other on a websocket
+        self._last_delivery = max(delivery, self._last_delivery)
+        return self._last_delivery
+
+
+class NetworkShaper:
+    """Applies NetworkConditions to both directions of a Session."""
+
+    def __init__(
+        self,
+        conditions: NetworkConditions,
+        write: Callable[[str | bytes], Awaitable[None]],
+        close: Callable[[], Awaitable[None]],
+    ) -> None:
+        """
+        Apply NetworkConditions to both directions of a Session.
+
+        Args:
+        ----
+            conditions (NetworkConditions): Network conditions
+            write (Callable): writes a frame to the websocket
+            close (Callable): closes the websocket
+
+        """
+        loop = asyncio.get_running_loop()
+        self.conditions = conditions
+        self._write = write
+        self._close = close
+        self._scheduler = get_scheduler()
+        self._send = _Direction(conditions, loop)
+        self._receive = _Direction(conditions, loop)
+        self._queue: deque[tuple[float, str | bytes]] = deque()
+        self._drain_task: asyncio.Task | None = None
+        self.dropped = 0
+        "Number of dropped frames"
+
+    def _drop(self) -> bool:
+        conditions = self.conditions
+        if conditions.loss and random.random() < conditions.loss:  # noqa: S311
+            self.dropped += 1
+            return True
+        return False
+
+    def _disconnect(self) -> bool:
+        conditions = self.conditions
+        return bool(conditions.disconnect) and random.random() < conditions.disconnect  # noqa: S311
+
+    def send(self, frame: str | bytes) -> None:
+        """Queue a frame for sending, does not block."""
+        if self._drop():
+            return
+        if (
+            self.conditions.queue_limit is not None
+            and len(self._queue) >= self.conditions.queue_limit
+        ):
+            self.dropped += 1
+            return
+        self._queue.append((self._send.delivery_time(len(frame)), frame))
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        """Send queued frames when they are due, runs while frames are queued."""
+        try:
+            while self._queue:
+                when, frame = self._queue[0]
+                await self._scheduler.wait_until(when)
+                self._queue.popleft()
+                if self._disconnect():
+                    _LOGGER.debug("Emulated disconnect")
+                    self._queue.clear()
+                    await self._close()
+                    return
+                await self._write(frame)
+        except Exception:
+            _LOGGER.exception("Error sending shaped frame")
+            self._queue.clear()
+        finally:
+            self._drain_task = None
+
+    async def receive(self, size: int) -> bool:
+        """Delay a received frame, returns False if the frame is dropped."""
+        if self._drop():
+            return False
+        if self._disconnect():
+            _LOGGER.debug("Emulated disconnect")
+            await self._close()
+            return False
+        await self._scheduler.wait_until(self._receive.delivery_time(size))
+        return True
+
+    def cancel(self) -> None:
+        """Stop sending queued frames."""
+        self._queue.clear()
+        if self._drain_task is not None and self._drain_task is not asyncio.current_task():
+            self._drain_task.cancel()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from homeconnect_websocket.entities import Access
+from homeconnect_websocket.helpers import TYPE_MAPPING
+
+if TYPE_CHECKING:
+    from homeconnect_websocket import DeviceDescription
+
+    from .events import EntityChangeEvent
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProgramEngine:
+    """
+    Option availability, access and ranges per Program.
+
+    The Option states of every Program are computed once from the Device description.
+    The differences between two Programs are computed on first use and cached, so
+    switching Programs only touches the affected Options. Options changed by other
+    means are tracked with entity_changed() and reset on the next selection.
+    """
+
+    selected: int | None = None
+    "uid of the selected Program, None before the first selection"
+
+    managed: frozenset[int]
+    "uids of the Options referenced by any Program"
+
+    changed: set[int]
+    "Managed Options changed by other means since the last selection"
+
+    def __init__(self, description: DeviceDescription) -> None:
+        """
+        Option availability, access and ranges per Program.
+
+        Args:
+        ----
+            description (DeviceDescription): parsed Device description
+
+        """
+        options = {option["uid"]: option for option in description.get("option", [])}
+        programs = {
+            program["uid"]: {ref["refUID"]: ref for ref in program.get("options", [])}
+            for program in description.get("program", [])
+        }
+        # Options not referenced by any Program are not managed
+        self.managed = frozenset(
+            uid for refs in programs.values() for uid in refs if uid in options
+        )
+        self.changed = set()
+
+        self._targets: dict[int, dict[int, dict]] = {}
+        for program_uid, refs in programs.items():
+            self._targets[program_uid] = {
+                uid: self._option_state(options[uid], refs[uid])
+                if uid in refs
+                else {"available": False}
+                for uid in self.managed
+            }
+        self._transitions: dict[tuple[int | None, int], list[tuple[int, dict]]] = {}
+
+    @staticmethod
+    def _option_state(option: dict, ref: dict) -> dict:
+        """State of an Option in a Program."""
+        convert = TYPE_MAPPING.get(option.get("protocolType"), lambda value: value)
+        state = {"available": ref.get("available", True)}
+        access = ref.get("access", option.get("access"))
+        if access is not None:
+            state["access"] = Access(access.lower())
+        for key in ("min", "max", "stepSize"):
+            value = ref.get(key, option.get(key))
+            if value is not None:
+                state[key] = convert(value)
+        return state
+
+    def __contains__(self, program_uid: int) -> bool:
+        return program_uid in self._targets
+
+    def option_state(self, program_uid: int, uid: int) -> dict | None:
+        """State of an Option in a Program in the format of Entity.restore(), None if unmanaged."""
+        return self._targets.get(program_uid, {}).get(uid)
+
+    def entity_changed(self, event: EntityChangeEvent) -> None:
+        """Track an Option changed by other means, synchronous EventBus subscriber."""
+        if event.entity.uid in self.managed:
+            self.changed.add(event.entity.uid)
+
+    def select(self, program_uid: int) -> list[tuple[int, dict]]:
+        """
+        Select a Program.
+
+        Returns the Option states that change, in the format of Entity.restore(). The Options
+        changed by other means are included, call changed.clear() once they are applied.
+        """
+        if program_uid not in self._targets:
+            _LOGGER.debug("Unknown Program %s", program_uid)
+            return []
+        key = (self.selected, program_uid)
+        if key not in self._transitions:
+            target = self._targets[program_uid]
+            if self.selected is None:
+                self._transitions[key] = list(target.items())
+            else:
+                current = self._targets[self.selected]
+                self._transitions[key] = [
+                    (uid, state) for uid, state in target.items() if current[uid] != state
+                ]
+        self.selected = program_uid
+        transition = self._transitions[key]
+        if not self.changed:
+            return transition
+        target = self._targets[program_uid]
+        states = dict(transition)
+        states.update((uid, target[uid]) for uid in self.changed)
+        return list(states.items())
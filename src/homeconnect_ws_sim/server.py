@@ -1,39 +1,51 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
+import time
+from dataclasses import replace
 from importlib.resources import files
 from io import BytesIO
 from pathlib import Path
 from typing import TYPE_CHECKING
-from zipfile import ZipFile
 
 from aiohttp import BodyPartReader, MultipartReader, web
 from homeconnect_websocket import parse_device_description
 
 from .appliance import SimAppliance
+from .diagnostics import (
+    CONFIG_ENTRY_PATHS,
+    PROFILE_JSON_PATHS,
+    config_entry_config,
+    extract_field,
+    extract_file,
+)
+from .event_loop import LoopOptions
+from .heartbeat import HEARTBEAT_PROFILES, HeartbeatOptions, SessionLiveness, watch
+from .log import LogOptions
+from .network import NetworkConditions
+from .startup import startup_profile
+from .static import StaticFiles
+from .ws_compression import CompressionCache, CompressionOptions, prepare_websocket
 
 if TYPE_CHECKING:
-    import asyncio
-
     from homeconnect_websocket import DeviceDescription
 
     from .entities import Entity
+    from .events import EntityChangeEvent
+    from .fleet import FleetSupervisor
+    from .ws_compression import WebSocketSender
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def process_zip_file(
-    field: MultipartReader | BodyPartReader,
-) -> dict[str, dict | DeviceDescription]:
-    temp_file = b""
-    while True:
-        chunk = await field.read_chunk()  # 8192 bytes by default.
-        if not chunk:
-            break
-        temp_file = temp_file + chunk
-    with ZipFile(file=BytesIO(temp_file)) as profile_file:
+def parse_zip_file(data: bytes) -> dict[str, dict | DeviceDescription] | None:
+    """Parse a Profile ZIP file."""
+    from zipfile import ZipFile  # noqa: PLC0415
+
+    with ZipFile(file=BytesIO(data)) as profile_file:
         re_info = re.compile(".*.json$")
         infolist = profile_file.infolist()
         for file in infolist:
@@ -46,80 +58,204 @@ async def process_zip_file(
                 feature_file = profile_file.open(feature_file_name).read()
 
                 appliance_description = parse_device_description(description_file, feature_file)
-                return {
+                config = {
                     "description": appliance_description,
                     "psk64": appliance_info["key"],
                 }
+                if "iv" in appliance_info:
+                    config["iv64"] = appliance_info["iv"]
+                return config
         return None
 
 
+async def process_zip_file(
+    field: MultipartReader | BodyPartReader,
+) -> dict[str, dict | DeviceDescription]:
+    temp_file = b""
+    while True:
+        chunk = await field.read_chunk()  # 8192 bytes by default.
+        if not chunk:
+            break
+        temp_file = temp_file + chunk
+    return parse_zip_file(temp_file)
+
+
 async def process_json_file(
     field: MultipartReader | BodyPartReader,
 ) -> DeviceDescription:
-    file = await field.read()
-    data = json.loads(file.decode())
-    return {"psk64": data["key"]}
+    return await extract_field(field, PROFILE_JSON_PATHS)
 
 
 async def process_config_entry_file(
     field: MultipartReader | BodyPartReader,
 ) -> dict[str, dict | DeviceDescription]:
-    file = await field.read()
-    data = json.loads(file.decode())["data"]
-
-    config = {
-        "state": data["appliance_state"]["entities"],
-        "services": data["appliance_state"]["service_versions"],
-        "description": data["entry_data"]["description"],
-        "psk64": data["entry_data"]["psk"],
+    # Parsed while it is received, only the needed parts are kept
+    return config_entry_config(await extract_field(field, CONFIG_ENTRY_PATHS))
+
+
+def parse_profile_file(path: Path) -> dict[str, dict | DeviceDescription] | None:
+    """Parse a profile ZIP or diagnostic dump, returns None for other files."""
+    if path.name.endswith(".zip"):
+        return parse_zip_file(path.read_bytes())
+    if path.name.startswith("config_entry") and path.name.endswith(".json"):
+        with path.open("rb") as file:
+            return config_entry_config(extract_file(file, CONFIG_ENTRY_PATHS))
+    return None
+
+
+def _list_files(directory: Path) -> list[Path]:
+    return sorted(path for path in directory.iterdir() if path.is_file())
+
+
+async def load_profile_directory(directory: Path) -> list[dict]:
+    """Parse all profile ZIPs and diagnostic dumps in a directory in parallel."""
+    import multiprocessing  # noqa: PLC0415
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+
+    loop = asyncio.get_running_loop()
+    paths = await loop.run_in_executor(None, _list_files, directory)
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, parse_profile_file, path) for path in paths),
+            return_exceptions=True,
+        )
+    configs = []
+    for path, config in zip(paths, results, strict=True):
+        if isinstance(config, Exception):
+            # A corrupt file does not stop the others
+            _LOGGER.warning("Skipping %s, parsing failed: %r", path.name, config)
+        elif config is None:
+            _LOGGER.debug("Skipping %s", path.name)
+        elif "description" not in config or "psk64" not in config:
+            _LOGGER.warning("No Description or Key in %s", path.name)
+        else:
+            configs.append(config)
+    return configs
+
+
+def entity_update_message(entities: list[Entity]) -> dict:
+    """GUI message for changed entities."""
+    if len(entities) == 1:
+        return {
+            "action": "update",
+            "entity": entities[0].dump(),
+        }
+    return {
+        "action": "updates",
+        "entities": [entity.dump() for entity in entities],
     }
-    if data["entry_data"]["psk"] != "**REDACTED**":
-        config["psk64"] = data["entry_data"]["psk"]
-    return config
 
 
 class Server:
     appliance: SimAppliance = None
+    fleet: FleetSupervisor | None = None
 
-    def __init__(
-        self, config_file: Path, loop: asyncio.AbstractEventLoop, psk64: str | None = None
+    def __init__(  # noqa: PLR0913
+        self,
+        config_file: Path,
+        loop: asyncio.AbstractEventLoop,
+        psk64: str | None = None,
+        iv64: str | None = None,
+        *,
+        workers: int = 0,
+        base_port: int = 10443,
+        loop_options: LoopOptions | None = None,
+        log_options: LogOptions | None = None,
+        profile_dir: Path | None = None,
+        copies: int = 1,
+        gui_compression: CompressionOptions | None = None,
+        appliance_compression: CompressionOptions | None = None,
+        heartbeat: HeartbeatOptions | None = None,
     ):
         self.loop = loop
         self.psk64 = psk64
+        self.iv64 = iv64
         self.config_file = config_file
+        self.workers = workers
+        self.base_port = base_port
+        self.loop_options = loop_options or LoopOptions()
+        self.log_options = log_options or LogOptions()
+        self.profile_dir = profile_dir
+        self.copies = copies
         self.websockets: list[web.WebSocketResponse] = []
-        app = web.Application(loop=loop)
+        self.websocket_appliance: dict[web.WebSocketResponse, int] = {}
+        self.websocket_senders: dict[web.WebSocketResponse, WebSocketSender] = {}
+        self.websocket_liveness: dict[web.WebSocketResponse, SessionLiveness] = {}
+        self.heartbeat = heartbeat or HEARTBEAT_PROFILES["aiohttp"]
+        # The GUI only sends on user input, idle GUIs are not closed
+        self.gui_heartbeat = replace(self.heartbeat, idle_timeout=None)
+        self.gui_compression = CompressionCache(gui_compression or CompressionOptions())
+        self.appliance_compression = appliance_compression
+        # Created in run(), constructing the Server stays cheap
+        self.static: StaticFiles | None = None
+        self.runner: web.AppRunner | None = None
+
+    def _create_app(self) -> web.Application:
+        app = web.Application(loop=self.loop)
         app.add_routes(
             [
-                web.static(
-                    "/assets",
-                    Path(files()) / "frontend/dist/assets",
-                ),
+                web.get("/assets/{name:.*}", self.assets_handler),
+                web.get("/api/snapshots", self.snapshot_list_handler),
+                web.post("/api/snapshots/{name}", self.snapshot_take_handler),
+                web.post("/api/snapshots/{name}/restore", self.snapshot_restore_handler),
+                web.delete("/api/snapshots/{name}", self.snapshot_delete_handler),
+                web.post("/api/network", self.network_handler),
+                web.get("/api/compression", self.compression_handler),
+                web.get("/api/sessions", self.sessions_handler),
+                web.get("/api/timing", self.timing_handler),
+                web.delete("/api/timing", self.timing_reset_handler),
+                web.get("/api/entities", self.entities_get_handler),
+                web.patch("/api/entities", self.entities_patch_handler),
                 web.get("/{tail:.*}", self.root_handler),
                 web.post("/api/file_upload", self.file_upload_handler),
                 web.get("/api/ws", self.websocket_handler),
             ]
         )
-        self.runner = web.AppRunner(app, access_log=None)
+        return app
 
     async def run(self, port: int) -> None:
-        await self.runner.setup()
-        self.main_site = web.TCPSite(self.runner, port=port)
-        await self.main_site.start()
+        with startup_profile.phase("load frontend"):
+            self.static = StaticFiles(Path(files()) / "frontend/dist")
+            await self.loop.run_in_executor(None, self.static.load)
+        with startup_profile.phase("start http server"):
+            self.runner = web.AppRunner(self._create_app(), access_log=None)
+            await self.runner.setup()
+            self.main_site = web.TCPSite(self.runner, port=port)
+            await self.main_site.start()
+        if self.profile_dir:
+            start = time.monotonic()
+            with startup_profile.phase("parse profiles"):
+                configs = await load_profile_directory(self.profile_dir)
+            _LOGGER.info("Parsed %s profiles in %.3fs", len(configs), time.monotonic() - start)
+            self._start_fleet([config for config in configs for _ in range(self.copies)])
+            return
         if self.config_file and self.config_file.exists():
-            with self.config_file.open() as file:
+            with startup_profile.phase("load config"), self.config_file.open() as file:
                 appliance_config = json.load(file)
-            await self._start_appliance(
-                description=appliance_config["description"],
-                psk64=appliance_config["psk64"],
-                services=appliance_config.get("services"),
-                state=appliance_config.get("state"),
-            )
+            if self.workers:
+                self._start_fleet(
+                    appliance_config if isinstance(appliance_config, list) else [appliance_config]
+                )
+                return
+            if isinstance(appliance_config, list):
+                appliance_config = appliance_config[0]
+            with startup_profile.phase("start appliance"):
+                await self._start_appliance(
+                    description=appliance_config["description"],
+                    psk64=appliance_config["psk64"],
+                    iv64=appliance_config.get("iv64"),
+                    services=appliance_config.get("services"),
+                    state=appliance_config.get("state"),
+                )
 
-    async def root_handler(self, _: web.Request) -> web.Response:
-        return web.FileResponse(Path(files()) / "frontend/dist/index.html")
+    async def root_handler(self, request: web.Request) -> web.Response:
+        return self.static.response(request, "index.html", immutable=False)
 
-    async def file_upload_handler(self, request: web.Request) -> web.Response:
+    async def assets_handler(self, request: web.Request) -> web.Response:
+        # Vite puts a content hash in all asset file names
+        return self.static.response(request, f"assets/{request.match_info['name']}", immutable=True)
+
+    async def file_upload_handler(self, request: web.Request) -> web.Response:  # noqa: PLR0912
         _LOGGER.info("Got file upload")
         reader = await request.multipart()
         xml_feature_file = None
@@ -144,12 +280,17 @@ class Server:
             )
         if self.psk64:
             appliance_config["psk64"] = self.psk64
+        if self.iv64:
+            appliance_config["iv64"] = self.iv64
         if "description" not in appliance_config:
             _LOGGER.error("No Description")
             return web.Response()
         if "psk64" not in appliance_config:
             _LOGGER.error("No Key")
             return web.Response()
+        if self.fleet:
+            _LOGGER.error("Upload is not supported in fleet mode")
+            return web.Response()
 
         _LOGGER.info("Got description, starting appliance")
         if self.appliance:
@@ -160,6 +301,7 @@ class Server:
         await self._start_appliance(
             description=appliance_config["description"],
             psk64=appliance_config["psk64"],
+            iv64=appliance_config.get("iv64"),
             services=appliance_config.get("services"),
             state=appliance_config.get("state"),
         )
@@ -171,71 +313,289 @@ class Server:
         )
         return web.Response()
 
+    def _check_snapshot(self, name: str | None = None) -> None:
+        """Raise HTTP errors if no Appliance is running or the snapshot is unknown."""
+        if not self.appliance:
+            raise web.HTTPConflict(text="No Appliance running")
+        if name is not None and name not in self.appliance.snapshots:
+            raise web.HTTPNotFound(text="Unknown snapshot")
+
+    async def snapshot_list_handler(self, _: web.Request) -> web.Response:
+        self._check_snapshot()
+        return web.json_response(list(self.appliance.snapshots))
+
+    async def snapshot_take_handler(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self._check_snapshot()
+        self.appliance.take_snapshot(name)
+        return web.json_response({"name": name})
+
+    async def snapshot_restore_handler(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self._check_snapshot(name)
+        entities = await self.appliance.restore_snapshot(name)
+        return web.json_response({"name": name, "restored": len(entities)})
+
+    async def snapshot_delete_handler(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        self._check_snapshot(name)
+        self.appliance.delete_snapshot(name)
+        return web.json_response({"name": name})
+
+    async def network_handler(self, request: web.Request) -> web.Response:
+        """Set the emulated network conditions of the Appliance, null to disable."""
+        if not self.appliance:
+            raise web.HTTPConflict(text="No Appliance running")
+        data = await request.json()
+        conditions = None if data is None else NetworkConditions.from_dict(data)
+        self.appliance.set_network_conditions(conditions)
+        return web.json_response(data)
+
+    async def sessions_handler(self, _: web.Request) -> web.Response:
+        """Liveness metrics of the Appliance Sessions and GUI websockets."""
+        return web.json_response(
+            {
+                "appliance": self.appliance.session_metrics() if self.appliance else [],
+                "gui": [liveness.metrics() for liveness in self.websocket_liveness.values()],
+            }
+        )
+
+    async def timing_handler(self, _: web.Request) -> web.Response:
+        """Client response time histograms of the Appliance and of each connected Session."""
+        if not self.appliance:
+            raise web.HTTPConflict(text="No Appliance running")
+        return web.json_response(
+            {
+                "appliance": self.appliance.timing.dump(),
+                "sessions": self.appliance.session_timing(),
+            }
+        )
+
+    async def timing_reset_handler(self, _: web.Request) -> web.Response:
+        """Clear the response time histograms of the Appliance."""
+        if not self.appliance:
+            raise web.HTTPConflict(text="No Appliance running")
+        self.appliance.timing.reset()
+        return web.Response()
+
+    async def compression_handler(self, _: web.Request) -> web.Response:
+        """Websocket compression statistics of the GUI and the Appliance."""
+        appliance = None
+        if self.appliance and self.appliance.compression:
+            appliance = self.appliance.compression.stats()
+        return web.json_response({"gui": self.gui_compression.stats(), "appliance": appliance})
+
+    @staticmethod
+    def _appliance_id(request: web.Request) -> int:
+        """Fleet id from the 'appliance' query parameter, 0 if missing."""
+        try:
+            return int(request.query.get("appliance", 0))
+        except ValueError as exc:
+            raise web.HTTPBadRequest(text="Invalid appliance") from exc
+
+    def _check_appliance(self, appliance_id: int) -> None:
+        """Raise HTTP errors if the Appliance is not running."""
+        if self.fleet:
+            if appliance_id not in self.fleet.ports:
+                raise web.HTTPNotFound(text=f"Unknown Appliance {appliance_id}")
+        elif not self.appliance:
+            raise web.HTTPConflict(text="No Appliance running")
+
+    async def _entity_states(self, appliance_id: int) -> list[dict]:
+        self._check_appliance(appliance_id)
+        if self.fleet:
+            try:
+                return list((await self.fleet.fetch_states(appliance_id)).values())
+            except KeyError as exc:
+                raise web.HTTPNotFound(text=f"Unknown Appliance {appliance_id}") from exc
+        return self.appliance.dump()["entities"]
+
+    async def entities_get_handler(self, request: web.Request) -> web.Response:
+        """
+        Get entity states, optionally filtered.
+
+        Query parameters: 'type' and 'uid' as comma separated lists, 'appliance' in fleet mode.
+        """
+        entities = await self._entity_states(self._appliance_id(request))
+        try:
+            uids = {int(uid) for uid in request.query["uid"].split(",")}
+        except KeyError:
+            uids = None
+        except ValueError as exc:
+            raise web.HTTPBadRequest(text="Invalid uid") from exc
+        types = None
+        if "type" in request.query:
+            types = {entity_type.lower() for entity_type in request.query["type"].split(",")}
+        return web.json_response(
+            [
+                entity
+                for entity in entities
+                if (uids is None or entity["uid"] in uids)
+                and (types is None or entity["type"].lower() in types)
+            ]
+        )
+
+    async def entities_patch_handler(self, request: web.Request) -> web.Response:
+        """
+        Set the state of multiple entities as one batch.
+
+        The body is a list of entity states in the format of 'GET /api/entities',
+        each with its uid and only the keys to change.
+        """
+        appliance_id = self._appliance_id(request)
+        states = await request.json()
+        if not isinstance(states, list) or not all(
+            isinstance(state, dict) and "uid" in state for state in states
+        ):
+            raise web.HTTPBadRequest(text="Expected a list of entity states with uid")
+        self._check_appliance(appliance_id)
+        if self.fleet:
+            self.fleet.set_states(appliance_id, states)
+            return web.json_response({"queued": len(states)})
+        try:
+            entities = await self.appliance.set_state(states)
+        except KeyError as exc:
+            raise web.HTTPNotFound(text=f"Unknown entity {exc}") from exc
+        except (ValueError, TypeError) as exc:
+            raise web.HTTPBadRequest(text=str(exc)) from exc
+        return web.json_response({"changed": [entity.uid for entity in entities]})
+
     async def _start_appliance(
         self,
         description: dict,
         psk64: str,
+        iv64: str | None = None,
         state: dict | None = None,
         services: dict | None = None,
     ) -> None:
         self.appliance = SimAppliance(
             description=description,
             psk64=psk64,
+            iv64=iv64,
             services=services,
         )
+        self.appliance.set_compression(self.appliance_compression)
+        self.appliance.heartbeat = self.heartbeat
         if state:
-            await self.appliance.set_state(state)
-        for entity in self.appliance.entities.values():
-            entity.register_callback(self._entity_update)
+            self.appliance.set_initial_state(state)
+        self.appliance.bus.subscribe_batched(self._entity_events)
         await self.appliance.start(loop=self.loop)
         _LOGGER.info("Appliance started")
 
-    async def _entity_update(self, entity: Entity) -> None:
-        await self.async_websocket_broadcast(
-            {
+    def _start_fleet(self, configs: list[dict]) -> None:
+        for config in configs:
+            if self.psk64:
+                config["psk64"] = self.psk64
+            if self.iv64:
+                config["iv64"] = self.iv64
+        from .fleet import FleetSupervisor  # noqa: PLC0415
+
+        self.fleet = FleetSupervisor(
+            configs=configs,
+            workers=self.workers,
+            base_port=self.base_port,
+            loop=self.loop,
+            loop_options=self.loop_options,
+            log_options=self.log_options,
+            heartbeat=self.heartbeat,
+            update_callback=self._fleet_update,
+        )
+        self.fleet.start()
+
+    async def _fleet_update(self, appliance_id: int, entities: list[dict] | None) -> None:
+        if entities is None:
+            data = {
+                "action": "init",
+                "entities": list(self.fleet.states[appliance_id].values()),
+            }
+        elif len(entities) == 1:
+            data = {
                 "action": "update",
-                "entity": entity.dump(),
+                "entity": entities[0],
             }
-        )
+        else:
+            data = {
+                "action": "updates",
+                "entities": entities,
+            }
+        await self.async_websocket_broadcast(data, appliance_id)
+
+    async def _entity_events(self, events: list[EntityChangeEvent]) -> None:
+        entities = {event.entity.uid: event.entity for event in events}
+        await self.async_websocket_broadcast(entity_update_message(list(entities.values())))
 
     async def websocket_handler(self, request: web.Request) -> web.WebSocketResponse:
         _LOGGER.info("WebSocket connection from %s", request.remote)
-        ws = web.WebSocketResponse(heartbeat=2)
-        await ws.prepare(request)
-        if self.appliance:
-            await ws.send_json(
-                {
-                    "action": "init",
-                    "entities": self.appliance.dump()["entities"],
-                }
+        appliance_id = self._appliance_id(request)
+        ws, sender = await prepare_websocket(request, self.gui_compression, autoping=False)
+        liveness = SessionLiveness(ws, request.transport)
+        unwatch = watch(liveness, self.gui_heartbeat)
+        if self.fleet:
+            try:
+                states = await self.fleet.fetch_states(appliance_id)
+            except KeyError:
+                _LOGGER.warning("Unknown Appliance %s", appliance_id)
+            else:
+                await sender.send_str(
+                    json.dumps({"action": "init", "entities": list(states.values())})
+                )
+        elif self.appliance:
+            await sender.send_str(
+                json.dumps(
+                    {
+                        "action": "init",
+                        "entities": self.appliance.dump()["entities"],
+                    }
+                )
             )
         self.websockets.append(ws)
+        self.websocket_appliance[ws] = appliance_id
+        self.websocket_senders[ws] = sender
+        self.websocket_liveness[ws] = liveness
         while not ws.closed:
             async for msg in ws:
-                if msg.type != web.WSMsgType.TEXT:
+                if not liveness.received(msg) or msg.type != web.WSMsgType.TEXT:
                     continue
                 message = msg.json()
-                if message["action"] == "set":
+                if message["action"] == "set" and self.fleet:
+                    _LOGGER.info("Set state of Appliance %s: %s", appliance_id, message)
+                    try:
+                        self.fleet.set_state(
+                            appliance_id, message["uid"], {message["key"]: message["value"]}
+                        )
+                    except KeyError:
+                        _LOGGER.warning("Unknown Appliance %s", appliance_id)
+                elif message["action"] == "set":
                     _LOGGER.info("Set state: %s", message)
-                    entity = self.appliance.entities_uid[message["uid"]]
-                    await entity.set_state({message["key"]: message["value"]})
-                    await self.async_websocket_broadcast(
-                        {
-                            "action": "update",
-                            "entity": entity.dump(),
-                        }
-                    )
+                    try:
+                        await self.appliance.set_entity_state(
+                            message["uid"], {message["key"]: message["value"]}
+                        )
+                    except (KeyError, ValueError, TypeError):
+                        _LOGGER.warning("Invalid state for entity %s", message["uid"])
 
         self.websockets.remove(ws)
+        self.websocket_appliance.pop(ws, None)
+        self.websocket_senders.pop(ws, None)
+        self.websocket_liveness.pop(ws, None)
+        unwatch()
         _LOGGER.debug("WebSocket connection from %s closed", request.remote)
         return ws
 
-    async def async_websocket_broadcast(self, data: dict | None = None) -> None:
-        for websocket in self.websockets:
+    async def async_websocket_broadcast(
+        self, data: dict | None = None, appliance_id: int | None = None
+    ) -> None:
+        """Send data to all GUI websockets, or only to those showing the given fleet Appliance."""
+        # Serialized once, compressed at most once for all websockets
+        message = json.dumps(data)
+        for websocket in list(self.websockets):
+            if appliance_id is not None and self.websocket_appliance.get(websocket) != appliance_id:
+                continue
             try:
-                await websocket.send_json(data)
+                await self.websocket_senders[websocket].send_str(message)
             except (RuntimeError, ConnectionResetError):
                 await websocket.close()
-                self.websockets.remove(websocket)
+                if websocket in self.websockets:
+                    self.websockets.remove(websocket)
             except Exception:
                 _LOGGER.exception("Error sending WebSocket broadcast")
@@ -8,36 +8,70 @@ from homeconnect_websocket.message import Action, Message, load_message
 
 from homeconnect_ws_sim.const import NI_CONFIG, NI_INFO
 
-from .hc_socket import SimSocket
+from .entities import WriteRejectedError
+from .hc_socket import AesSimSocket, SimSocket
+from .timing import SessionTiming
 
 if TYPE_CHECKING:
+    from collections.abc import Coroutine
+
     from aiohttp import web
 
     from .appliance import SimAppliance
+    from .heartbeat import SessionLiveness
+    from .network import NetworkConditions
+    from .wire import MessageTemplate
+    from .ws_compression import WebSocketSender
+
+
+STATIC_RESOURCES = {"/ci/services", "/iz/info", "/ni/info", "/ni/config"}
+"Resources answered from pre-serialized templates"
 
 
 class SimSession:
     _sid: int | None = None
     _last_msg_id: int | None = None
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         websocket: web.WebSocketResponse,
         appliance: SimAppliance,
         *,
         logger: logging.Logger | None = None,
+        sender: WebSocketSender | None = None,
+        liveness: SessionLiveness | None = None,
+        timing: SessionTiming | None = None,
     ):
         self._appliance = appliance
+        self.timing = timing or SessionTiming()
         self.app_info = {
             "endDeviceID": 0,
             "connected": True,
             "protected": False,
         }
-        self._socket = SimSocket(
-            host=websocket.get_extra_info("peername")[0],
-            websocket=websocket,
-            logger=logger,
-        )
+        host = websocket.get_extra_info("peername")[0]
+        self.host = host
+        self.liveness = liveness
+        if appliance.aes_keys:
+            self._socket = AesSimSocket(
+                host=host,
+                websocket=websocket,
+                keys=appliance.aes_keys,
+                logger=logger,
+                sender=sender,
+                liveness=liveness,
+            )
+        else:
+            self._socket = SimSocket(
+                host=host,
+                websocket=websocket,
+                logger=logger,
+                sender=sender,
+                liveness=liveness,
+            )
+
+        if appliance.network_conditions:
+            self._socket.set_network_conditions(appliance.network_conditions)
 
         if logger is None:
             self._logger = logging.getLogger(__name__)
@@ -57,6 +91,7 @@ class SimSession:
             async for message in self._socket:
                 # recv messages
                 message_obj = load_message(message)
+                self.timing.received(message_obj)
                 await self._message_handler(message_obj)
 
         except Exception:
@@ -65,29 +100,14 @@ class SimSession:
 
     async def _message_handler(self, message: Message) -> None:
         if message.action == Action.GET:
-            if message.resource == "/ci/services":
-                resp = message.responde(
-                    data=[
-                        {"service": service, "version": version}
-                        for service, version in self._appliance.service_versions.items()
-                    ]
-                )
-                await self.send(resp)
-            elif message.resource == "/iz/info":
-                resp = message.responde(data=self._appliance.info)
-                await self.send(resp)
+            if message.resource in STATIC_RESOURCES:
+                await self._send_static_response(message)
             elif message.resource == "/ci/registeredDevices":
                 resp = message.responde(data=[self.app_info])
                 await self.send(resp)
             elif message.resource == "/ci/pairableDevices":
                 resp = message.responde(data=[{"deviceTypeList": []}])
                 await self.send(resp)
-            elif message.resource == "/ni/info":
-                resp = message.responde(data=[NI_INFO])
-                await self.send(resp)
-            elif message.resource == "/ni/config":
-                resp = message.responde(data=[NI_CONFIG])
-                await self.send(resp)
             elif message.resource == "/ro/allDescriptionChanges":
                 resp = message.responde(data=self._appliance.get_all_description_changes())
                 await self.send(resp)
@@ -110,10 +130,10 @@ class SimSession:
                 await self.send(resp)
         elif message.action == Action.POST:
             if message.resource == "/ro/values":
-                await self._appliance.update_entities(message.data)
-                resp = message.responde()
-                await self.send(resp)
-            elif message.resource in {"/ro/activeProgram", "/ro/selectedProgram"}:
+                await self._write(message, self._appliance.update_entities(message.data))
+            elif message.resource == "/ro/selectedProgram":
+                await self._write(message, self._appliance.write_selected_program(message.data))
+            elif message.resource == "/ro/activeProgram":
                 resp = message.responde()
                 await self.send(resp)
         elif message.action == Action.NOTIFY:
@@ -128,6 +148,57 @@ class SimSession:
             resp.code = 404
             await self.send(resp)
 
+    async def _write(self, message: Message, write: Coroutine) -> None:
+        """Respond to a write, with the error code if it was rejected."""
+        resp = message.responde()
+        try:
+            await write
+        except WriteRejectedError as exc:
+            self._logger.info("Rejected write to %s: %s", message.resource, exc)
+            resp.code = exc.code
+        await self.send(resp)
+
+    def _static_data(self, resource: str) -> list | dict:
+        if resource == "/ci/services":
+            return [
+                {"service": service, "version": version}
+                for service, version in self._appliance.service_versions.items()
+            ]
+        if resource == "/iz/info":
+            return self._appliance.info
+        if resource == "/ni/info":
+            return [NI_INFO]
+        return [NI_CONFIG]
+
+    async def _send_static_response(self, message: Message) -> None:
+        """Respond from the pre-serialized template of the resource."""
+        if message.sid is None or message.msg_id is None:
+            await self.send(message.responde(data=self._static_data(message.resource)))
+            return
+        template = self._appliance.wire.response(
+            message, lambda: self._static_data(message.resource)
+        )
+        await self._socket.send(template.encode(message.sid, message.msg_id))
+
+    def metrics(self) -> dict:
+        """Liveness metrics of the Session."""
+        metrics = {"host": self.host, "sid": self._sid}
+        if self.liveness is not None:
+            metrics.update(self.liveness.metrics())
+        return metrics
+
+    def timing_metrics(self) -> dict:
+        """Client response times of the Session."""
+        return {"host": self.host, "sid": self._sid, **self.timing.metrics()}
+
+    def set_network_conditions(self, conditions: NetworkConditions | None) -> None:
+        """Emulate network conditions for this Session, None to disable."""
+        self._socket.set_network_conditions(conditions)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        await self._socket.close()
+
     def _set_message_info(self, message: Message) -> None:
         """Set Message infos. called before sending message."""
         # Set service version
@@ -146,4 +217,15 @@ class SimSession:
 
     async def send(self, message: Message) -> None:
         self._set_message_info(message)
+        if message.action in {Action.GET, Action.POST}:
+            self.timing.request_sent(message.msg_id, message.resource)
+        elif message.action == Action.NOTIFY:
+            self.timing.notify_sent()
         await self._socket.send(message.dump())
+
+    async def send_template(self, template: MessageTemplate) -> None:
+        """Send a pre-serialized NOTIFY with the sID and next msgID of this Session."""
+        msg_id = self._last_msg_id
+        self._last_msg_id += 1
+        self.timing.notify_sent()
+        await self._socket.send(template.encode(self._sid, msg_id))
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import io
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import cProfile
+    from collections.abc import Iterator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Phase timings of the startup, reported with '--profile-startup'.
+
+    Phases are cheap no-ops while disabled.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._origin = time.perf_counter()
+        self._phases: list[tuple[str, float, float]] = []
+        self._profiler: cProfile.Profile | None = None
+
+    def enable(self, origin: float | None = None) -> None:
+        """
+        Start recording phases and profiling function calls.
+
+        Args:
+        ----
+            origin (Optional[float]): perf_counter() at which the startup began
+
+        """
+        import cProfile  # noqa: PLC0415
+
+        self.enabled = True
+        if origin is not None:
+            self._origin = origin
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def mark(self, name: str, start: float, end: float | None = None) -> None:
+        """Record a phase between perf_counter() start and end, defaults to now."""
+        if self.enabled:
+            end = time.perf_counter() if end is None else end
+            self._phases.append((name, start - self._origin, end - start))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the duration of a phase."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, start)
+
+    def report(self, top: int = 15) -> str:
+        """Stop profiling and format the phases and the most expensive calls."""
+        lines = [
+            (
+                f"Startup took {time.perf_counter() - self._origin:.3f}s, "
+                f"{len(sys.modules)} modules loaded"
+            ),
+            f"{'phase':<32} {'start':>8} {'duration':>9}",
+        ]
+        lines.extend(
+            f"{name:<32} {start:>7.3f}s {duration:>8.3f}s" for name, start, duration in self._phases
+        )
+        if self._profiler is not None:
+            import pstats  # noqa: PLC0415
+
+            self._profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+            lines.append(stream.getvalue())
+            self._profiler = None
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        """Log the report once, if enabled."""
+        if self.enabled:
+            _LOGGER.info("Startup profile:\n%s", self.report())
+            self.enabled = False
+
+
+startup_profile = StartupProfile()
+"Startup profile of this process"
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_LOGGER = logging.getLogger(__name__)
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+"Cache-Control for hashed assets"
+
+CACHE_REVALIDATE = "no-cache"
+"Cache-Control for files without content hash in the name"
+
+
+@dataclass
+class StaticFile:
+    """In-memory static file with precompressed variants."""
+
+    body: bytes
+    content_type: str
+    etag: str
+    "Strong ETag of the uncompressed body"
+    encodings: dict[str, bytes] = field(default_factory=dict)
+    "Compressed bodies by content encoding"
+
+    def variant_etag(self, encoding: str | None) -> str:
+        """Strong ETag of a content encoding, every encoding has its own."""
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    encodings = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in {"q=0", "q=0.0", "q=0.00", "q=0.000"}:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class StaticFiles:
+    """The built frontend, read once and served from memory."""
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._files: dict[str, StaticFile] = {}
+
+    def load(self) -> None:
+        """Read all files and precompute ETags and compressed variants."""
+        if not self._root.is_dir():
+            _LOGGER.warning("Frontend not found at %s", self._root)
+            return
+        for path in self._root.rglob("*"):
+            if not path.is_file():
+                continue
+            body = path.read_bytes()
+            content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            static_file = StaticFile(
+                body=body,
+                content_type=content_type,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            )
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                static_file.encodings["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body)
+                if len(compressed) < len(body):
+                    static_file.encodings["br"] = compressed
+            self._files[path.relative_to(self._root).as_posix()] = static_file
+        _LOGGER.debug("Loaded %s frontend files", len(self._files))
+
+    def response(self, request: web.Request, name: str, *, immutable: bool) -> web.Response:
+        """Response for a file, honoring If-None-Match and Accept-Encoding."""
+        static_file = self._files.get(name)
+        if static_file is None:
+            raise web.HTTPNotFound
+
+        body = static_file.body
+        encoding = None
+        if static_file.encodings:
+            accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+            for candidate in ("br", "gzip"):
+                if candidate in accepted and candidate in static_file.encodings:
+                    body = static_file.encodings[candidate]
+                    encoding = candidate
+                    break
+
+        etag = static_file.variant_etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": CACHE_IMMUTABLE if immutable else CACHE_REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        # Weak comparison, as If-None-Match requires
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            return web.Response(status=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return web.Response(body=body, content_type=static_file.content_type, headers=headers)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+from homeconnect_websocket.message import Action
+
+if TYPE_CHECKING:
+    from homeconnect_websocket.message import Message
+
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"Upper bounds of the histogram buckets in seconds, larger values go to an overflow bucket"
+
+NOTIFY_FOLLOW_WINDOW = 30.0
+"Only GETs within this many seconds of a NOTIFY are timed as following it"
+
+_MAX_PENDING = 256
+
+
+class Histogram:
+    """Durations in fixed buckets, with count, sum, min and max."""
+
+    __slots__ = ("count", "counts", "maximum", "minimum", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum: float | None = None
+        self.maximum: float | None = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate a quantile as the upper bound of its bucket, at most the maximum."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(BUCKETS):
+                    return min(BUCKETS[index], self.maximum)
+                break
+        return self.maximum
+
+    def dump(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.minimum,
+            "max": self.maximum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": [
+                {"le": bound, "count": count}
+                for bound, count in zip((*BUCKETS, None), self.counts, strict=True)
+            ],
+        }
+
+
+class TimingStats:
+    """
+    Histograms by name.
+
+    'response:<resource>': client response to a request sent by the Appliance,
+    'handshake:initial_values': connect until the /ei/initialValues response,
+    'handshake:queries': /ei/initialValues response until /ei/deviceReady,
+    'handshake:device_ready': connect until /ei/deviceReady,
+    'notify_to_get': NOTIFY until the next GET of the client,
+    'ping': round trip time of websocket pings.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+
+    def observe(self, name: str, value: float) -> None:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def reset(self) -> None:
+        self.histograms.clear()
+
+    def dump(self) -> dict:
+        return {name: histogram.dump() for name, histogram in sorted(self.histograms.items())}
+
+
+class SessionTiming:
+    """Response times of the client of a Session, requests and responses are matched by msgID."""
+
+    def __init__(self, aggregate: TimingStats | None = None) -> None:
+        """
+        Session timing.
+
+        Args:
+        ----
+            aggregate (Optional[TimingStats]): Receives every duration as well,
+                usually the stats of the Appliance
+
+        """
+        self._loop = asyncio.get_running_loop()
+        self._aggregate = aggregate
+        self._pending: dict[int, tuple[str, float]] = {}
+        self._notified: float | None = None
+        self.connected = self._loop.time()
+        self.stats = TimingStats()
+        self.handshake: dict[str, float] = {}
+        "Seconds from connect to each handshake step"
+
+    def observe(self, name: str, value: float) -> None:
+        self.stats.observe(name, value)
+        if self._aggregate is not None:
+            self._aggregate.observe(name, value)
+
+    def request_sent(self, msg_id: int, resource: str) -> None:
+        """Start timing a request sent to the client."""
+        if len(self._pending) >= _MAX_PENDING:
+            # Unanswered requests, forget the oldest
+            del self._pending[next(iter(self._pending))]
+        self._pending[msg_id] = (resource, self._loop.time())
+
+    def notify_sent(self) -> None:
+        if self._notified is None:
+            self._notified = self._loop.time()
+
+    def received(self, message: Message) -> None:
+        """Record a message of the client."""
+        now = self._loop.time()
+        if message.action == Action.RESPONSE and message.msg_id in self._pending:
+            resource, sent = self._pending.pop(message.msg_id)
+            self.observe(f"response:{resource}", now - sent)
+            if resource == "/ei/initialValues" and "initial_values" not in self.handshake:
+                self._handshake_step("initial_values", now)
+        elif message.action == Action.GET and self._notified is not None:
+            if now - self._notified <= NOTIFY_FOLLOW_WINDOW:
+                self.observe("notify_to_get", now - self._notified)
+            self._notified = None
+        elif (
+            message.action == Action.NOTIFY
+            and message.resource == "/ei/deviceReady"
+            and "device_ready" not in self.handshake
+        ):
+            self._handshake_step("device_ready", now)
+            if "initial_values" in self.handshake:
+                self.observe(
+                    "handshake:queries",
+                    self.handshake["device_ready"] - self.handshake["initial_values"],
+                )
+
+    def _handshake_step(self, step: str, now: float) -> None:
+        self.handshake[step] = now - self.connected
+        self.observe(f"handshake:{step}", self.handshake[step])
+
+    def metrics(self) -> dict:
+        """Handshake steps and histograms."""
+        return {"handshake": dict(self.handshake), "histograms": self.stats.dump()}
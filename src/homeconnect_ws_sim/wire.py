@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any
+
+from homeconnect_websocket.message import Action, Message
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Placeholders serialized in place of the spliced fields, the templates are cut at them
+_SID = 7391046825518307
+_MSG_ID = 7391046825518311
+_DATA = 7391046825518317
+
+
+class MessageTemplate:
+    """Serialized Message, sID and msgID are spliced in when sending."""
+
+    __slots__ = ("_head", "_middle", "_tail")
+
+    def __init__(self, head: str, middle: str, tail: str) -> None:
+        self._head = head
+        self._middle = middle
+        self._tail = tail
+
+    @classmethod
+    def from_message(cls, message: Message) -> MessageTemplate:
+        """Create a template from a Message, its sID and msgID are overwritten."""
+        message.sid = _SID
+        message.msg_id = _MSG_ID
+        head, rest = message.dump().split(str(_SID), 1)
+        middle, tail = rest.split(str(_MSG_ID), 1)
+        return cls(head, middle, tail)
+
+    def encode(self, sid: int, msg_id: int) -> str:
+        """Serialize with the given sID and msgID."""
+        return f"{self._head}{sid}{self._middle}{msg_id}{self._tail}"
+
+
+class ValuesTemplate:
+    """/ro/values NOTIFY with the serialized parts of each uid cached."""
+
+    def __init__(self, version: int) -> None:
+        self._version = version
+        base = MessageTemplate.from_message(self._message([_DATA, _DATA]))
+        self._head = base._head  # noqa: SLF001
+        self._middle = base._middle  # noqa: SLF001
+        self._open, self._separator, self._close = base._tail.split(str(_DATA))  # noqa: SLF001
+        self._items: dict[int, tuple[str, str]] = {}
+
+    def _message(self, data: list) -> Message:
+        message = Message(resource="/ro/values", action=Action.NOTIFY, data=data)
+        message.version = self._version
+        return message
+
+    def _item(self, uid: int) -> tuple[str, str]:
+        """Get the serialized entry of a uid, split at the value."""
+        if uid not in self._items:
+            message = self._message([{"uid": uid, "value": _DATA}])
+            tail = MessageTemplate.from_message(message)._tail  # noqa: SLF001
+            item = tail[len(self._open) : len(tail) - len(self._close)]
+            prefix, suffix = item.split(str(_DATA))
+            self._items[uid] = (prefix, suffix)
+        return self._items[uid]
+
+    def prepare(self, values: list[dict]) -> MessageTemplate:
+        """Template of a NOTIFY for the given uid/value entries."""
+        parts = []
+        for entry in values:
+            prefix, suffix = self._item(entry["uid"])
+            parts.append(f"{prefix}{json.dumps(entry['value'])}{suffix}")
+        data = self._separator.join(parts)
+        return MessageTemplate(self._head, self._middle, f"{self._open}{data}{self._close}")
+
+
+class WireEncoder:
+    """
+    Pre-serialized Messages of an Appliance.
+
+    Responses to static resources are serialized once per resource and version,
+    value NOTIFYs are assembled from cached per uid parts and serialized once for
+    all Sessions. Only sID and msgID are spliced in per Message.
+    """
+
+    def __init__(self, service_versions: dict[str, int]) -> None:
+        self._responses: dict[tuple[str, int | None], MessageTemplate] = {}
+        self._values = ValuesTemplate(service_versions.get("ro", 1))
+
+    def response(self, request: Message, data: Callable[[], Any]) -> MessageTemplate:
+        """Template of the response to a static resource, data is called on first use."""
+        key = (request.resource, request.version)
+        if key not in self._responses:
+            self._responses[key] = MessageTemplate.from_message(request.responde(data=data()))
+        return self._responses[key]
+
+    def values(self, values: list[dict]) -> MessageTemplate:
+        """Template of a /ro/values NOTIFY."""
+        return self._values.prepare(values)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from aiohttp.base_protocol import BaseProtocol
+
+_WS_DEFLATE_TRAILING = b"\x00\x00\xff\xff"
+_OPCODE_TEXT = 0x1
+_FIN = 0x80
+_RSV1 = 0x40
+
+
+@dataclass(frozen=True)
+class CompressionOptions:
+    """permessage-deflate settings of a websocket endpoint."""
+
+    enabled: bool = False
+    "Negotiate permessage-deflate with clients"
+
+    threshold: int = 1024
+    "Only messages of at least this many bytes are compressed"
+
+    level: int = 6
+    "zlib compression level"
+
+    cache_size: int = 32
+    "Number of compressed messages kept for reuse"
+
+
+class CompressionCache:
+    """
+    Compressed messages of an endpoint, with statistics.
+
+    Every message is compressed on its own (no context takeover), which any
+    permessage-deflate client can decode, so a message sent to many clients is
+    compressed once.
+    """
+
+    def __init__(self, options: CompressionOptions) -> None:
+        self.options = options
+        self._cache: OrderedDict[tuple[bytes, int], bytes] = OrderedDict()
+        self.messages = 0
+        "Messages compressed or taken from the cache"
+        self.cache_hits = 0
+        self.bytes_in = 0
+        "Uncompressed size of compressed messages"
+        self.bytes_out = 0
+        "Compressed size of compressed messages"
+        self.compress_time = 0.0
+        "CPU time spend compressing in seconds"
+
+    def compress(self, payload: bytes, wbits: int) -> bytes:
+        """Compress a message for permessage-deflate with wbits window bits."""
+        key = (payload, wbits)
+        self.messages += 1
+        self.bytes_in += len(payload)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+        else:
+            start = time.process_time()
+            compressobj = zlib.compressobj(self.options.level, zlib.DEFLATED, -wbits)
+            compressed = compressobj.compress(payload) + compressobj.flush(zlib.Z_SYNC_FLUSH)
+            compressed = compressed.removesuffix(_WS_DEFLATE_TRAILING)
+            self.compress_time += time.process_time() - start
+            self._cache[key] = compressed
+            if len(self._cache) > self.options.cache_size:
+                self._cache.popitem(last=False)
+        self.bytes_out += len(compressed)
+        return compressed
+
+    def stats(self) -> dict:
+        """Compression statistics."""
+        return {
+            "messages": self.messages,
+            "cache_hits": self.cache_hits,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "compress_time": self.compress_time,
+        }
+
+
+class WebSocketSender:
+    """
+    Sends text messages, compressing only those above the threshold.
+
+    aiohttp compresses every message once permessage-deflate is negotiated,
+    so when it is, frames are written to the transport directly. Like aiohttp's
+    writer, sending waits while the protocol has writing paused.
+    """
+
+    def __init__(
+        self,
+        websocket: web.WebSocketResponse,
+        transport: asyncio.Transport | None = None,
+        cache: CompressionCache | None = None,
+        protocol: BaseProtocol | None = None,
+    ) -> None:
+        self._websocket = websocket
+        self._transport = transport
+        self._cache = cache
+        self._protocol = protocol
+
+    async def send_str(self, data: str) -> None:
+        wbits = self._websocket.compress
+        if not wbits or self._cache is None or self._transport is None:
+            await self._websocket.send_str(data)
+            return
+        if self._websocket.closed or self._transport.is_closing():
+            msg = "Cannot write to closing transport"
+            raise ConnectionResetError(msg)
+
+        payload = data.encode()
+        rsv = 0
+        if len(payload) >= self._cache.options.threshold:
+            payload = self._cache.compress(payload, wbits)
+            rsv = _RSV1
+        self._transport.write(_frame_header(len(payload), rsv) + payload)
+        # The transport pauses the protocol above its high-water mark, a slow client
+        # would otherwise buffer every message in memory
+        if self._protocol is not None and self._protocol.writing_paused:
+            await self._protocol._drain_helper()  # noqa: SLF001
+
+    async def send_bytes(self, data: bytes) -> None:
+        """Send a binary frame, aiohttp deflates it if permessage-deflate was negotiated."""
+        await self._websocket.send_bytes(data)
+
+
+def _frame_header(length: int, rsv: int) -> bytes:
+    first_byte = _FIN | rsv | _OPCODE_TEXT
+    if length < 126:  # noqa: PLR2004
+        return struct.pack("!BB", first_byte, length)
+    if length < 65536:  # noqa: PLR2004
+        return struct.pack("!BBH", first_byte, 126, length)
+    return struct.pack("!BBQ", first_byte, 127, length)
+
+
+async def prepare_websocket(
+    request: web.Request, cache: CompressionCache | None = None, **kwargs: float | bool
+) -> tuple[web.WebSocketResponse, WebSocketSender]:
+    """Prepare a websocket, negotiating permessage-deflate if enabled."""
+    compress = cache is not None and cache.options.enabled
+    websocket = web.WebSocketResponse(compress=compress, **kwargs)
+    await websocket.prepare(request)
+    return websocket, WebSocketSender(
+        websocket, request.transport, cache if compress else None, request.protocol
+    )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import copy
+
+import pytest
+
+DESCRIPTION = {
+    "info": {"deviceType": "Dishwasher", "vib": "SMV0000", "brand": "BOSCH"},
+    "status": [
+        {
+            "uid": 1,
+            "name": "BSH.Common.Status.OperationState",
+            "protocolType": "Integer",
+            "access": "read",
+            "available": True,
+            "enumeration": {"0": "Inactive", "1": "Ready", "2": "Run"},
+        },
+    ],
+    "setting": [
+        {
+            "uid": 2,
+            "name": "BSH.Common.Setting.PowerState",
+            "protocolType": "Integer",
+            "access": "readWrite",
+            "available": True,
+            "enumeration": {"1": "Off", "2": "On"},
+            "initValue": "1",
+        },
+        {
+            "uid": 3,
+            "name": "BSH.Common.Setting.ChildLock",
+            "protocolType": "Boolean",
+            "access": "readWrite",
+            "available": True,
+        },
+    ],
+    "event": [{"uid": 4, "name": "BSH.Common.Event.ProgramFinished", "protocolType": "Integer"}],
+    "command": [],
+    "option": [
+        {
+            "uid": 10,
+            "name": "Dishcare.Dishwasher.Option.Temperature",
+            "protocolType": "Integer",
+            "access": "readWrite",
+            "available": True,
+            "min": "40",
+            "max": "70",
+            "stepSize": "5",
+        },
+        {
+            "uid": 11,
+            "name": "Dishcare.Dishwasher.Option.ExtraDry",
+            "protocolType": "Boolean",
+            "access": "readWrite",
+            "available": True,
+        },
+        {
+            "uid": 12,
+            "name": "Dishcare.Dishwasher.Option.HalfLoad",
+            "protocolType": "Boolean",
+            "access": "readWrite",
+            "available": True,
+        },
+    ],
+    "program": [
+        {
+            "uid": 20,
+            "name": "Dishcare.Dishwasher.Program.Eco50",
+            "available": True,
+            "options": [
+                {"refUID": 10, "access": "readWrite", "available": True, "min": "45"},
+                {"refUID": 11, "access": "readWrite", "available": True},
+            ],
+        },
+        {
+            "uid": 21,
+            "name": "Dishcare.Dishwasher.Program.Quick45",
+            "available": True,
+            "options": [
+                {"refUID": 10, "access": "read", "available": True},
+                {"refUID": 12, "access": "readWrite", "available": True},
+            ],
+        },
+        {
+            "uid": 22,
+            "name": "Dishcare.Dishwasher.Program.Intensiv70",
+            "available": True,
+            "options": [
+                {"refUID": 10, "access": "read", "available": True},
+                {"refUID": 12, "access": "readWrite", "available": True},
+            ],
+        },
+    ],
+    "activeProgram": {
+        "uid": 30,
+        "name": "BSH.Common.Root.ActiveProgram",
+        "access": "read",
+        "protocolType": "Integer",
+    },
+    "selectedProgram": {
+        "uid": 31,
+        "name": "BSH.Common.Root.SelectedProgram",
+        "access": "readWrite",
+        "protocolType": "Integer",
+    },
+}
+"Device description in the shape of parse_device_description()"
+
+
+@pytest.fixture
+def description() -> dict:
+    return copy.deepcopy(DESCRIPTION)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pytest
+
+from homeconnect_ws_sim.appliance import SimAppliance
+
+PSK64 = "cHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHM"
+
+
+async def test_entities_built_on_first_use_with_initial_state(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+    appliance.set_initial_state([{"uid": 2, "value": "On"}, {"uid": 99, "value": 1}])
+    assert "entities_uid" not in appliance.__dict__
+
+    assert appliance.settings["BSH.Common.Setting.PowerState"].value_raw == 2
+    assert set(appliance.entities_uid) == {1, 2, 3, 4, 10, 11, 12, 20, 21, 22, 30, 31}
+    assert 20 in appliance.program_engine
+
+
+async def test_entities_built_by_any_entity_attribute(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+
+    assert appliance._active_program.uid == 30
+    assert "entities_uid" in appliance.__dict__
+    assert appliance.entities_uid[31] is appliance._selected_program
+
+    del description["activeProgram"]
+    assert SimAppliance(description, PSK64)._active_program is None
+
+
+async def test_set_state_validates_before_first_use(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+
+    with pytest.raises(KeyError):
+        await appliance.set_state([{"uid": 99, "value": 1}])
+    with pytest.raises(ValueError, match="Enum"):
+        await appliance.set_state([{"uid": 2, "value": "Standby"}])
+    assert await appliance.set_state([{"uid": 2, "value": "On"}]) == [appliance.entities_uid[2]]
+
+
+async def test_build_error_is_not_hidden(
+    description: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def broken(_: object) -> None:
+        raise AttributeError("broken")  # noqa: EM101, TRY003
+
+    monkeypatch.setattr("homeconnect_ws_sim.appliance.ProgramEngine", broken)
+    appliance = SimAppliance(description, PSK64)
+
+    with pytest.raises(AttributeError, match="broken"):
+        _ = appliance.status
+
+
+async def test_failed_build_leaves_no_entities(description: dict) -> None:
+    del description["program"][1]["name"]
+    appliance = SimAppliance(description, PSK64)
+
+    with pytest.raises(KeyError):
+        _ = appliance.entities_uid
+    # Nothing of the failed build is kept, every access fails the same way
+    assert not {"status", "settings", "entities", "entities_uid"} & appliance.__dict__.keys()
+    with pytest.raises(KeyError):
+        _ = appliance.status
+
+
+async def test_restore_snapshot_keeps_changes_made_while_sending(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+    power, child_lock = appliance.entities_uid[2], appliance.entities_uid[3]
+    appliance.take_snapshot("base")
+    await power.set_state({"value_raw": 2})
+    send_values = appliance.send_values
+
+    async def change_while_sending(values: list[dict]) -> None:
+        child_lock.restore({"value_raw": True})
+        await send_values(values)
+
+    appliance.send_values = change_while_sending
+    assert await appliance.restore_snapshot("base") == [power]
+    appliance.send_values = send_values
+
+    assert await appliance.restore_snapshot("base") == [child_lock]
+    assert child_lock.value_raw is None
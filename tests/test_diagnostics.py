@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+import aiohttp
+from aiohttp import web
+
+from homeconnect_ws_sim.diagnostics import (
+    CONFIG_ENTRY_PATHS,
+    _extract_from_json,
+    extract_field,
+    extract_file,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from aiohttp.test_utils import TestClient
+
+
+def _dump(description: dict) -> bytes:
+    return json.dumps(
+        {
+            "home_assistant": {"version": "2026.10.0", "dev": False},
+            "data": {
+                "entry_data": {
+                    "description": description,
+                    "psk": "cHNr",
+                    "extra": [{"description": "not this one"}, 1.5, None],
+                },
+                "appliance_state": {
+                    "entities": [
+                        {"uid": 2, "value": "On", "ratio": 0.25, "name": "Ärger"},
+                        {"uid": 10, "value": 55},
+                    ],
+                    "service_versions": {"ro": 2},
+                    "entities_count": 2,
+                },
+                "entities": [{"uid": 99}],
+            },
+        }
+    ).encode()
+
+
+async def test_extract_field_matches_json_loads(
+    description: dict, aiohttp_client: Callable[..., Awaitable[TestClient]]
+) -> None:
+    results = []
+
+    async def handler(request: web.Request) -> web.Response:
+        reader = await request.multipart()
+        field = await reader.next()
+        results.append(await extract_field(field, CONFIG_ENTRY_PATHS))
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/", handler)
+    client = await aiohttp_client(app)
+    dump = _dump(description)
+    form = aiohttp.FormData()
+    form.add_field("file", dump, filename="config_entry-dishwasher.json")
+
+    assert (await client.post("/", data=form)).status == 200
+
+    expected = _extract_from_json(dump, CONFIG_ENTRY_PATHS)
+    assert results == [expected]
+    assert extract_file(BytesIO(dump), CONFIG_ENTRY_PATHS) == expected
+    assert set(expected) == {"description", "psk64", "state", "services"}
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from base64 import urlsafe_b64encode
+from functools import partial
+
+import pytest
+
+from homeconnect_ws_sim.fleet import FleetSupervisor, FleetWorker
+
+PSK64 = urlsafe_b64encode(bytes(range(32))).decode().rstrip("=")
+IV64 = urlsafe_b64encode(bytes(range(16))).decode().rstrip("=")
+
+
+async def test_fetch_fails_when_worker_exits() -> None:
+    loop = asyncio.get_running_loop()
+    fleet = FleetSupervisor([{}, {}], 1, 30000, loop)
+    conn, worker_conn = multiprocessing.Pipe()
+    # The pipe of a started worker with both Appliances
+    for appliance_id in (0, 1):
+        fleet._appliance_conn[appliance_id] = conn
+        fleet.ports[appliance_id] = 30000 + appliance_id
+    loop.add_reader(conn.fileno(), partial(fleet._on_message, conn))
+
+    fetch = loop.create_task(fleet.fetch_states(0))
+    await asyncio.sleep(0)
+    assert worker_conn.recv() == ("dump", 0, None, None)
+    worker_conn.close()
+
+    with pytest.raises(KeyError):
+        await asyncio.wait_for(fetch, 5)
+    assert fleet.ports == {}
+    with pytest.raises(KeyError):
+        await fleet.fetch_states(1)
+    conn.close()
+
+
+async def test_worker_sends_updates_of_fetched_appliances(description: dict) -> None:
+    loop = asyncio.get_running_loop()
+    conn, worker_conn = multiprocessing.Pipe()
+    config = {"description": description, "psk64": PSK64, "iv64": IV64}
+    worker = FleetWorker([(0, 0, config), (1, 0, config)], worker_conn, loop)
+    await worker.start()
+    try:
+        assert {conn.recv(), conn.recv()} == {("started", 0, None), ("started", 1, None)}
+
+        conn.send(("dump", 1, None, None))
+        message, appliance_id, _ = await loop.run_in_executor(None, conn.recv)
+        assert (message, appliance_id) == ("init", 1)
+
+        # The change of the unfetched Appliance is published first, but not sent
+        await worker.appliances[0].entities_uid[2].set_state({"value": "On"})
+        for _ in range(3):
+            await asyncio.sleep(0)
+        await worker.appliances[1].entities_uid[3].set_state({"value_raw": True})
+        message, appliance_id, entities = await loop.run_in_executor(None, conn.recv)
+        assert (message, appliance_id) == ("update", 1)
+        assert [entity["uid"] for entity in entities] == [3]
+    finally:
+        loop.remove_reader(worker_conn.fileno())
+        for appliance in worker.appliances.values():
+            await appliance.stop()
+        conn.close()
+        worker_conn.close()
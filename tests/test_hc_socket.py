@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hmac
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from secrets import token_bytes
+
+import aiohttp
+import pytest
+from Crypto.Cipher import AES
+
+from homeconnect_ws_sim.embedded import run_appliances
+from homeconnect_ws_sim.hc_socket import derive_aes_keys
+from homeconnect_ws_sim.network import NetworkConditions
+from homeconnect_ws_sim.ws_compression import CompressionOptions
+
+PSK64 = urlsafe_b64encode(bytes(range(32))).decode().rstrip("=")
+IV64 = urlsafe_b64encode(bytes(range(16))).decode().rstrip("=")
+
+
+class AesClient:
+    """Client side of the AES framing."""
+
+    def __init__(self, psk64: str, iv64: str) -> None:
+        psk = urlsafe_b64decode(psk64 + "===")
+        self.iv = urlsafe_b64decode(iv64 + "===")
+        enckey = hmac.digest(psk, b"ENC", digest="sha256")
+        self.mackey = hmac.digest(psk, b"MAC", digest="sha256")
+        self.encrypt = AES.new(enckey, AES.MODE_CBC, self.iv)
+        self.decrypt = AES.new(enckey, AES.MODE_CBC, self.iv)
+        self.last_tx = bytes(16)
+        self.last_rx = bytes(16)
+
+    def _hmac(self, direction: bytes, last: bytes, enc_msg: bytes) -> bytes:
+        return hmac.digest(self.mackey, self.iv + direction + last + enc_msg, "sha256")[:16]
+
+    def encode(self, message: dict) -> bytes:
+        clear = json.dumps(message).encode()
+        pad_len = 16 - (len(clear) % 16)
+        if pad_len == 1:
+            pad_len += 16
+        clear = clear + b"\x00" + token_bytes(pad_len - 2) + bytes([pad_len])
+        enc_msg = self.encrypt.encrypt(clear)
+        self.last_tx = self._hmac(b"E", self.last_tx, enc_msg)
+        return enc_msg + self.last_tx
+
+    def decode(self, frame: bytes) -> dict:
+        enc_msg, recv_hmac = frame[:-16], frame[-16:]
+        assert hmac.compare_digest(recv_hmac, self._hmac(b"C", self.last_rx, enc_msg))
+        self.last_rx = recv_hmac
+        clear = self.decrypt.decrypt(enc_msg)
+        return json.loads(clear[: -clear[-1]])
+
+
+def test_derive_aes_keys() -> None:
+    keys = derive_aes_keys(PSK64, IV64)
+    psk = urlsafe_b64decode(PSK64 + "===")
+    assert keys.iv == bytes(range(16))
+    assert keys.enckey == hmac.digest(psk, b"ENC", digest="sha256")
+    mac = keys.mac.copy()
+    mac.update(b"E")
+    expected = hmac.digest(
+        hmac.digest(psk, b"MAC", digest="sha256"), keys.iv + b"E", digest="sha256"
+    )
+    assert mac.digest() == expected
+
+
+async def test_cipher_state_kept_across_frames(description: dict) -> None:
+    async with (
+        run_appliances({"description": description, "psk64": PSK64, "iv64": IV64}) as (app,),
+        aiohttp.ClientSession() as session,
+        session.ws_connect(app.url) as ws,
+    ):
+        client = AesClient(PSK64, IV64)
+        initial = client.decode(await ws.receive_bytes())
+        assert initial["resource"] == "/ei/initialValues"
+        sid = initial["sID"]
+        # Lengths around the block size cover the padding edge cases
+        for msg_id, resource in enumerate(["/ci/services", "/iz/info", "/ni/info", "/ni/config"]):
+            await ws.send_bytes(
+                client.encode(
+                    {
+                        "sID": sid,
+                        "msgID": msg_id,
+                        "resource": resource,
+                        "version": 1,
+                        "action": "GET",
+                        "data": [{"x": "y" * msg_id}],
+                    }
+                )
+            )
+            response = client.decode(await ws.receive_bytes())
+            assert response["msgID"] == msg_id
+            assert response["resource"] == resource
+            assert response["action"] == "RESPONSE"
+
+
+@pytest.mark.parametrize("tamper", ["hmac", "unaligned", "text"])
+async def test_invalid_frame_closes_session(description: dict, tamper: str) -> None:
+    async with (
+        run_appliances({"description": description, "psk64": PSK64, "iv64": IV64}) as (app,),
+        aiohttp.ClientSession() as session,
+        session.ws_connect(app.url) as ws,
+    ):
+        client = AesClient(PSK64, IV64)
+        client.decode(await ws.receive_bytes())
+        frame = client.encode({"sID": 1, "msgID": 1, "resource": "/ci/services", "action": "GET"})
+        if tamper == "hmac":
+            await ws.send_bytes(frame[:-1] + bytes([frame[-1] ^ 1]))
+        elif tamper == "unaligned":
+            await ws.send_bytes(frame + b"\x00")
+        else:
+            await ws.send_str("{}")
+        message = await ws.receive()
+        assert message.type in {aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED}
+
+
+async def test_frame_loss_keeps_cipher_state(description: dict) -> None:
+    async with (
+        run_appliances({"description": description, "psk64": PSK64, "iv64": IV64}) as (app,),
+        aiohttp.ClientSession() as session,
+        session.ws_connect(app.url) as ws,
+    ):
+        client = AesClient(PSK64, IV64)
+        sid = client.decode(await ws.receive_bytes())["sID"]
+        app.appliance.set_network_conditions(NetworkConditions(loss=0.5))
+        for msg_id in range(40):
+            await ws.send_bytes(
+                client.encode(
+                    {
+                        "sID": sid,
+                        "msgID": msg_id,
+                        "resource": "/iz/info",
+                        "version": 1,
+                        "action": "GET",
+                    }
+                )
+            )
+        received = []
+        while True:
+            try:
+                frame = await ws.receive_bytes(timeout=0.2)
+            except TimeoutError:
+                break
+            received.append(client.decode(frame)["msgID"])
+        # Both directions drop frames, the remaining ones decode and the session is alive
+        assert 0 < len(received) < 40
+        assert received == sorted(received)
+        assert not ws.closed
+        assert len(app.appliance.sessions) == 1
+
+
+async def test_compression_not_offered(description: dict) -> None:
+    async with (
+        run_appliances({"description": description, "psk64": PSK64, "iv64": IV64}) as (app,),
+        aiohttp.ClientSession() as session,
+    ):
+        app.appliance.set_compression(CompressionOptions(enabled=True, threshold=0))
+        assert app.appliance.compression is None
+        async with session.ws_connect(app.url, compress=15) as ws:
+            assert ws.compress == 0
+            initial = AesClient(PSK64, IV64).decode(await ws.receive_bytes())
+            assert initial["resource"] == "/ei/initialValues"
+
+
+async def test_malformed_write_is_rejected(description: dict) -> None:
+    async with (
+        run_appliances({"description": description, "psk64": PSK64, "iv64": IV64}) as (app,),
+        aiohttp.ClientSession() as session,
+        session.ws_connect(app.url) as ws,
+    ):
+        client = AesClient(PSK64, IV64)
+        sid = client.decode(await ws.receive_bytes())["sID"]
+        for msg_id, (resource, data) in enumerate(
+            [
+                ("/ro/values", [{"uid": "abc", "value": 1}]),
+                ("/ro/selectedProgram", [{"options": []}]),
+                ("/ro/values", [{"uid": 2, "value": 2}]),
+            ]
+        ):
+            message = {"sID": sid, "msgID": msg_id, "version": 1, "action": "POST"}
+            await ws.send_bytes(client.encode({**message, "resource": resource, "data": data}))
+            response = client.decode(await ws.receive_bytes())
+            while response["action"] == "NOTIFY":
+                response = client.decode(await ws.receive_bytes())
+            assert response["msgID"] == msg_id
+            assert response.get("code") == (None if msg_id == 2 else 400)
+        assert app.appliance.entities_uid[2].value_raw == 2
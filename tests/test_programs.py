@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+
+from homeconnect_websocket.entities import Access
+
+from homeconnect_ws_sim.appliance import SimAppliance
+from homeconnect_ws_sim.programs import ProgramEngine
+
+PSK64 = "cHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHM"
+
+
+def test_option_states_from_program_options(description: dict) -> None:
+    engine = ProgramEngine(description)
+
+    assert engine.managed == {10, 11, 12}
+    assert dict(engine.select(20)) == {
+        10: {"available": True, "access": Access.READ_WRITE, "min": 45, "max": 70, "stepSize": 5},
+        11: {"available": True, "access": Access.READ_WRITE},
+        12: {"available": False},
+    }
+    assert engine.selected == 20
+    assert engine.option_state(21, 10) == {
+        "available": True,
+        "access": Access.READ,
+        "min": 40,
+        "max": 70,
+        "stepSize": 5,
+    }
+    assert engine.option_state(21, 2) is None
+
+
+def test_select_returns_affected_options(description: dict) -> None:
+    engine = ProgramEngine(description)
+    engine.select(21)
+
+    assert engine.select(22) == []
+    assert dict(engine.select(20)) == {
+        10: engine.option_state(20, 10),
+        11: engine.option_state(20, 11),
+        12: engine.option_state(20, 12),
+    }
+    engine.changed.add(11)
+    assert dict(engine.select(20)) == {11: engine.option_state(20, 11)}
+
+
+def test_unknown_program(description: dict) -> None:
+    engine = ProgramEngine(description)
+
+    assert 99 not in engine
+    assert engine.select(99) == []
+    assert engine.selected is None
+
+
+async def test_select_program_resets_changed_options(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+    temperature = appliance.entities_uid[10]
+
+    await appliance.select_program(21)
+    assert temperature.access == Access.READ
+    # Changed by other means, the next Program has the same Option states as the current one
+    await temperature.set_state({"access": "readWrite", "available": False})
+    await appliance.select_program(22)
+
+    assert temperature.access == Access.READ
+    assert temperature.available is True
+    assert appliance.entities_uid[31].value_raw == 22
+    assert not appliance.program_engine.changed
+
+
+async def test_restored_snapshot_is_kept(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+    temperature = appliance.entities_uid[10]
+    await appliance.select_program(20)
+    await temperature.set_state({"min": 50})
+    appliance.take_snapshot("base")
+
+    await appliance.select_program(21)
+    await appliance.restore_snapshot("base")
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+    assert appliance.entities_uid[31].value_raw == 20
+    assert temperature.access == Access.READ_WRITE
+    assert temperature.min == 50
+
+
+async def test_gui_selection_selects_program(description: dict) -> None:
+    appliance = SimAppliance(description, PSK64)
+
+    await appliance.set_entity_state(31, {"value_raw": 21})
+
+    assert appliance.program_engine.selected == 21
+    assert appliance.entities_uid[10].access == Access.READ
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import TYPE_CHECKING
+
+from homeconnect_websocket.entities import Access
+
+from homeconnect_ws_sim.appliance import SimAppliance
+from homeconnect_ws_sim.server import Server, load_profile_directory
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from pathlib import Path
+
+    from aiohttp.test_utils import TestClient
+
+
+def _config_entry(description: dict) -> dict:
+    return {
+        "data": {
+            "entry_data": {"description": description, "psk": "cHNr", "aes_iv": "**REDACTED**"},
+            "appliance_state": {"entities": [], "service_versions": {"ro": 1}},
+        }
+    }
+
+
+async def test_load_profile_directory_skips_corrupt_files(
+    tmp_path: Path, description: dict
+) -> None:
+    (tmp_path / "config_entry-good.json").write_text(json.dumps(_config_entry(description)))
+    (tmp_path / "broken.zip").write_bytes(b"not a zip file")
+    (tmp_path / "config_entry-broken.json").write_text('{"data": {"entry_data": ')
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    configs = await load_profile_directory(tmp_path)
+
+    assert len(configs) == 1
+    assert configs[0]["psk64"] == "cHNr"
+    assert configs[0]["description"]["info"] == description["info"]
+    assert "iv64" not in configs[0]
+
+
+async def test_patch_invalid_access_is_bad_request(
+    tmp_path: Path, description: dict, aiohttp_client: Callable[..., Awaitable[TestClient]]
+) -> None:
+    server = Server(tmp_path / "config.json", asyncio.get_running_loop())
+    server.appliance = SimAppliance(description, "cHNr")
+    client = await aiohttp_client(server._create_app())
+
+    response = await client.patch("/api/entities", json=[{"uid": 10, "access": 1}])
+
+    assert response.status == 400
+    assert server.appliance.entities_uid[10].access == Access.READ_WRITE
+
+
+async def test_invalid_appliance_id_is_bad_request(
+    tmp_path: Path, description: dict, aiohttp_client: Callable[..., Awaitable[TestClient]]
+) -> None:
+    server = Server(tmp_path / "config.json", asyncio.get_running_loop())
+    server.appliance = SimAppliance(description, "cHNr")
+    client = await aiohttp_client(server._create_app())
+
+    assert (await client.get("/api/entities?appliance=abc")).status == 400
+    response = await client.patch("/api/entities?appliance=abc", json=[{"uid": 2, "value": "On"}])
+    assert response.status == 400
+    assert server.appliance.entities_uid[2].value_raw == 1
+
+
+async def test_patch_without_appliance_is_conflict(
+    tmp_path: Path, aiohttp_client: Callable[..., Awaitable[TestClient]]
+) -> None:
+    server = Server(tmp_path / "config.json", asyncio.get_running_loop())
+    client = await aiohttp_client(server._create_app())
+
+    response = await client.patch("/api/entities", json=[{"uid": 2, "value": "On"}])
+    assert response.status == 409
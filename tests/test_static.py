@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from aiohttp import web
+
+from homeconnect_ws_sim.static import StaticFiles
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from pathlib import Path
+
+    from aiohttp.test_utils import TestClient
+
+
+@pytest.fixture
+async def client(
+    tmp_path: Path, aiohttp_client: Callable[..., Awaitable[TestClient]]
+) -> TestClient:
+    (tmp_path / "index.html").write_text("<html>" + "<div>frontend</div>" * 100 + "</html>")
+    static = StaticFiles(tmp_path)
+    static.load()
+
+    async def handler(request: web.Request) -> web.Response:
+        return static.response(request, "index.html", immutable=False)
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    return await aiohttp_client(app)
+
+
+async def test_etag_per_content_encoding(client: TestClient) -> None:
+    etags = {}
+    for encoding in ("identity", "gzip", "br"):
+        response = await client.get("/", headers={"Accept-Encoding": encoding})
+        assert response.status == 200
+        assert response.headers.get("Content-Encoding", "identity") == encoding
+        etags[encoding] = response.headers["ETag"]
+
+    assert len(set(etags.values())) == 3
+    assert etags["gzip"] == etags["identity"][:-1] + '-gzip"'
+
+
+async def test_if_none_match_uses_selected_variant(client: TestClient) -> None:
+    gzip_etag = (await client.get("/", headers={"Accept-Encoding": "gzip"})).headers["ETag"]
+
+    response = await client.get(
+        "/", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag}
+    )
+    assert response.status == 304
+    assert response.headers["ETag"] == gzip_etag
+
+    # The gzip validator does not match the identity body
+    response = await client.get(
+        "/", headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag}
+    )
+    assert response.status == 200
+    assert "Content-Encoding" not in response.headers
+
+    response = await client.get(
+        "/", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"other", W/{gzip_etag}'}
+    )
+    assert response.status == 304
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import pytest
+from homeconnect_websocket.entities import Access
+
+from homeconnect_ws_sim.appliance import SimAppliance
+from homeconnect_ws_sim.entities import (
+    CODE_INVALID_VALUE,
+    CODE_NOT_WRITABLE,
+    CODE_UNKNOWN_ENTITY,
+    WriteRejectedError,
+)
+
+PSK64 = "cHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHNrcHM"
+
+
+@pytest.fixture
+def appliance(description: dict) -> SimAppliance:
+    return SimAppliance(description, PSK64)
+
+
+@pytest.mark.parametrize(
+    ("uid", "value", "code"),
+    [
+        (2, 3, CODE_INVALID_VALUE),
+        (2, "1", CODE_INVALID_VALUE),
+        (3, 1, CODE_INVALID_VALUE),
+        (10, 35, CODE_INVALID_VALUE),
+        (10, 75, CODE_INVALID_VALUE),
+        (10, 42, CODE_INVALID_VALUE),
+        (10, 42.5, CODE_INVALID_VALUE),
+        (1, 1, CODE_NOT_WRITABLE),
+        (4, 1, CODE_NOT_WRITABLE),
+        (20, 1, CODE_NOT_WRITABLE),
+        (99, 1, CODE_UNKNOWN_ENTITY),
+    ],
+)
+async def test_rejected_write(appliance: SimAppliance, uid: int, value: object, code: int) -> None:
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.update_entities([{"uid": uid, "value": value}])
+    assert exc_info.value.code == code
+    assert exc_info.value.uid == uid
+
+
+async def test_batch_is_applied_only_if_valid(appliance: SimAppliance) -> None:
+    with pytest.raises(WriteRejectedError):
+        await appliance.update_entities([{"uid": 2, "value": 2}, {"uid": 10, "value": 75}])
+    assert appliance.entities_uid[2].value_raw == 1
+
+    changed = await appliance.update_entities([{"uid": 2, "value": 2}, {"uid": 10, "value": 45.0}])
+    assert [entity.uid for entity in changed] == [2, 10]
+    assert appliance.entities_uid[10].value_raw == 45
+
+
+@pytest.mark.parametrize(
+    ("program_uid", "value", "code"),
+    [
+        # Below the minimum of Eco50, within the range of the Option
+        (20, 40, CODE_INVALID_VALUE),
+        # Read only in Quick45, writable before the selection
+        (21, 50, CODE_NOT_WRITABLE),
+    ],
+)
+async def test_select_program_validates_against_program(
+    appliance: SimAppliance, program_uid: int, value: int, code: int
+) -> None:
+    temperature = appliance.entities_uid[10]
+
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.select_program(program_uid, [{"uid": 10, "value": value}])
+
+    assert exc_info.value.code == code
+    assert appliance.program_engine.selected is None
+    assert appliance.entities_uid[31].value_raw is None
+    assert temperature.min == 40
+    assert temperature.access == Access.READ_WRITE
+    assert appliance.entities_uid[12].available is True
+
+
+async def test_select_program_with_options(appliance: SimAppliance) -> None:
+    await appliance.select_program(20, [{"uid": 10, "value": 55}, {"uid": 11, "value": True}])
+
+    assert appliance.program_engine.selected == 20
+    assert appliance.entities_uid[31].value_raw == 20
+    assert appliance.entities_uid[10].min == 45
+    assert appliance.entities_uid[10].value_raw == 55
+    assert appliance.entities_uid[11].value_raw is True
+    assert appliance.entities_uid[12].available is False
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"uid": 2, "value": 2},
+        [{"value": 2}],
+        [{"uid": "abc", "value": 2}],
+        [{"uid": True, "value": 2}],
+        ["2"],
+    ],
+)
+async def test_malformed_write(appliance: SimAppliance, data: object) -> None:
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.update_entities(data)
+    assert exc_info.value.code == CODE_INVALID_VALUE
+    assert exc_info.value.uid is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"program": 20},
+        [],
+        [{"options": []}],
+        [{"program": "20"}],
+        [{"program": 20, "options": {"uid": 10, "value": 50}}],
+        [{"program": 20, "options": [{"value": 50}]}],
+    ],
+)
+async def test_malformed_program_selection(appliance: SimAppliance, data: object) -> None:
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.write_selected_program(data)
+    assert exc_info.value.code == CODE_INVALID_VALUE
+    assert appliance.program_engine.selected is None
+
+
+@pytest.mark.parametrize(
+    ("program_uid", "code"),
+    [(999, CODE_UNKNOWN_ENTITY), (2, CODE_UNKNOWN_ENTITY), (22, CODE_NOT_WRITABLE)],
+)
+async def test_select_program_rejects_program(
+    appliance: SimAppliance, program_uid: int, code: int
+) -> None:
+    await appliance.entities_uid[22].set_state({"available": False})
+
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.write_selected_program([{"program": program_uid}])
+
+    assert exc_info.value.code == code
+    assert appliance.program_engine.selected is None
+    assert appliance.entities_uid[31].value_raw is None
+
+
+async def test_unavailable_option_is_rejected(appliance: SimAppliance) -> None:
+    # HalfLoad is available before the selection but not in Eco50
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.select_program(20, [{"uid": 12, "value": True}])
+    assert exc_info.value.code == CODE_NOT_WRITABLE
+    assert appliance.program_engine.selected is None
+
+    await appliance.select_program(20)
+    with pytest.raises(WriteRejectedError) as exc_info:
+        await appliance.update_entities([{"uid": 12, "value": True}])
+    assert exc_info.value.code == CODE_NOT_WRITABLE
+    assert appliance.entities_uid[12].value_raw is None
+
+
+async def test_string_is_not_converted(description: dict) -> None:
+    description["setting"].append(
+        {
+            "uid": 5,
+            "name": "BSH.Common.Setting.Name",
+            "protocolType": "String",
+            "access": "readWrite",
+            "available": True,
+        }
+    )
+    appliance = SimAppliance(description, PSK64)
+
+    for value in (1, None, ["Dishwasher"]):
+        with pytest.raises(WriteRejectedError):
+            await appliance.update_entities([{"uid": 5, "value": value}])
+    await appliance.update_entities([{"uid": 5, "value": "Dishwasher"}])
+    assert appliance.entities_uid[5].value_raw == "Dishwasher"
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pytest
+from homeconnect_websocket.message import Action, Message
+
+from homeconnect_ws_sim.wire import MessageTemplate, WireEncoder
+
+
+def test_template_matches_dump() -> None:
+    message = Message(resource="/ci/services", version=1, action=Action.RESPONSE, data=[{"a": 1}])
+    template = MessageTemplate.from_message(message)
+
+    message.sid = 12
+    message.msg_id = 345
+    assert template.encode(12, 345) == message.dump()
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [{"uid": 2, "value": 1}],
+        [{"uid": 2, "value": 1}, {"uid": 3, "value": True}, {"uid": 4, "value": 'A "quoted" text'}],
+        [{"uid": 10, "value": 1.5}, {"uid": 2, "value": None}],
+    ],
+)
+def test_values_template_matches_dump(values: list[dict]) -> None:
+    encoder = WireEncoder({"ro": 2})
+    message = Message(sid=7, msg_id=8, resource="/ro/values", action=Action.NOTIFY, data=values)
+    message.version = 2
+
+    assert encoder.values(values).encode(7, 8) == message.dump()
+    # Parts of known uids are taken from the cache
+    assert encoder.values(values).encode(7, 8) == message.dump()
+
+
+def test_response_serialized_once() -> None:
+    encoder = WireEncoder({"ci": 1})
+    services = [{"service": "ci", "version": 1}]
+    calls = []
+
+    def data() -> list[dict]:
+        calls.append(None)
+        return services
+
+    for sid, msg_id in ((1, 2), (3, 4)):
+        request = Message(sid=sid, msg_id=msg_id, resource="/ci/services", version=1)
+        template = encoder.response(request, data)
+        assert template.encode(sid, msg_id) == request.responde(data=services).dump()
+    assert len(calls) == 1
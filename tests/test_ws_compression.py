@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from aiohttp import web
+
+from homeconnect_ws_sim.ws_compression import (
+    CompressionCache,
+    CompressionOptions,
+    prepare_websocket,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from aiohttp.test_utils import TestClient
+
+    from homeconnect_ws_sim.ws_compression import WebSocketSender
+
+SMALL = "small"
+LARGE = "large " * 200
+
+
+async def _client(
+    aiohttp_client: Callable[..., Awaitable[TestClient]],
+    handler: Callable[[web.WebSocketResponse, WebSocketSender, web.Request], Awaitable[None]],
+    cache: CompressionCache,
+) -> TestClient:
+    async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
+        websocket, sender = await prepare_websocket(request, cache)
+        await handler(websocket, sender, request)
+        await websocket.close()
+        return websocket
+
+    app = web.Application()
+    app.router.add_get("/ws", websocket_handler)
+    return await aiohttp_client(app)
+
+
+async def test_threshold_and_cache(aiohttp_client: Callable[..., Awaitable[TestClient]]) -> None:
+    cache = CompressionCache(CompressionOptions(enabled=True, threshold=100))
+
+    async def handler(_: web.WebSocketResponse, sender: WebSocketSender, __: web.Request) -> None:
+        for data in (SMALL, LARGE, LARGE):
+            await sender.send_str(data)
+
+    client = await _client(aiohttp_client, handler, cache)
+    async with client.ws_connect("/ws", compress=15) as ws:
+        assert [await ws.receive_str() for _ in range(3)] == [SMALL, LARGE, LARGE]
+
+    stats = cache.stats()
+    assert stats["messages"] == 2
+    assert stats["cache_hits"] == 1
+    assert stats["bytes_in"] == 2 * len(LARGE)
+    assert stats["bytes_saved"] > len(LARGE)
+
+
+async def test_send_waits_while_writing_paused(
+    aiohttp_client: Callable[..., Awaitable[TestClient]],
+) -> None:
+    cache = CompressionCache(CompressionOptions(enabled=True, threshold=100))
+    done_while_paused = []
+
+    async def handler(
+        _: web.WebSocketResponse, sender: WebSocketSender, request: web.Request
+    ) -> None:
+        request.protocol.pause_writing()
+        send = asyncio.create_task(sender.send_str(LARGE))
+        await asyncio.sleep(0.05)
+        done_while_paused.append(send.done())
+        request.protocol.resume_writing()
+        await send
+
+    client = await _client(aiohttp_client, handler, cache)
+    async with client.ws_connect("/ws", compress=15) as ws:
+        assert await ws.receive_str() == LARGE
+    assert done_while_paused == [False]